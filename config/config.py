@@ -1,5 +1,43 @@
 import os
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+
+_RATE_SUFFIX = {"K": 1_000, "M": 1_000_000, "G": 1_000_000_000}
+
+
+@lru_cache(maxsize=32)
+def parse_rate(rate):
+    """Convierte una tasa de iperf3 ("5M", "12.5M", "1G") a bits por segundo."""
+    rate = rate.strip().upper()
+    multiplier = _RATE_SUFFIX.get(rate[-1:], 1)
+    number = rate[:-1] if rate[-1:] in _RATE_SUFFIX else rate
+    return int(float(number) * multiplier)
+
+
+_resolved_iperf = {}
+
+
+def resolve_iperf_path(path):
+    """Resuelve la ruta de iperf3 una sola vez por ruta; None si no existe.
+    
+    Solo se cachean rutas válidas, así instalar iperf3 con el programa
+    abierto no requiere reiniciarlo.
+    """
+    if path in _resolved_iperf:
+        return _resolved_iperf[path]
+    try:
+        resolved = Path(path).resolve(strict=True)
+    except (FileNotFoundError, OSError):
+        print(f"❌ iperf3 no encontrado en: {path}")
+        if any(part.lower().endswith(".exe") for part in Path(path).parts[:-1]):
+            print("   ⚠️ La ruta tiene una carpeta terminada en .exe (¿iperf3.exe\\iperf3.exe?) - revisar Config.IPERF_PATH")
+        return None
+    if not resolved.is_file():
+        print(f"❌ La ruta de iperf3 no es un archivo: {resolved}")
+        return None
+    _resolved_iperf[path] = os.fspath(resolved)
+    return _resolved_iperf[path]
 
 
 class Config:
@@ -23,29 +61,42 @@ class Config:
     # Heatmap settings
     GRID_RESOLUTION = 0.5
     HEATMAP_DPI = 300
+    AP_INFLUENCE_RADIUS = 5.0  # metros alrededor de los puntos medidos que se interpolan
     MEASUREMENT_INTERVAL = 30
+    
+    # Monitoreo continuo (services/main_monitor.py)
+    INTERVAL_MINUTES = 5
 
     # FILTRADO DE REDES - SOLO MONITOREAR ESTOS SSIDs
-    MONITORED_SSIDS = [
+    MONITORED_SSIDS = (
         "Pumita",           
         "Puma",              
         
-    ]
+    )
 
     # Si está vacío, monitorea TODAS las redes
     MONITOR_ALL_NETWORKS = False  # Cambiar a True para monitorear todo
     
+    # Opcional: limitar además a estos BSSIDs (tus propios APs); vacío = todos
+    MONITORED_BSSIDS = ()
+    
     # NUEVAS CONFIGURACIONES
     
     # UDP Test configurations
-    UDP_FORWARD_RATES = ["1M", "5M", "10M", "25M", "50M"]  # Velocidades para tests UDP forward
-    UDP_REVERSE_RATES = ["1M", "5M", "10M", "25M", "50M"]  # Velocidades para tests UDP reverse
+    UDP_FORWARD_RATES = ("1M", "5M", "10M", "25M", "50M")  # Velocidades para tests UDP forward
+    UDP_REVERSE_RATES = ("1M", "5M", "10M", "25M", "50M")  # Velocidades para tests UDP reverse
+    UDP_FORWARD_RATES_BPS = tuple(parse_rate(r) for r in UDP_FORWARD_RATES)
+    UDP_REVERSE_RATES_BPS = tuple(parse_rate(r) for r in UDP_REVERSE_RATES)
     UDP_PACKET_SIZE = 1400  # Tamaño de paquete UDP para evitar fragmentación
     
+    # Ethernet Gigabit: zerocopy, bloques de 128K y ventana de 4M para llegar a line rate
+    ETHERNET_TCP_OPTIONS = ("-Z", "-l", "128K", "-w", "4M")
+    
     # File organization
     SAVE_INDIVIDUAL_FILES = True  # Guardar cada medición en archivo separado
     SAVE_AP_DETAILS = True        # Guardar detalles por AP
     SAVE_SUMMARY_FILES = True     # Crear archivos de resumen .txt legibles
+    PRETTY_JSON = False           # JSON indentado en las mediciones individuales (el resumen .txt ya es legible)
     
     # Network info collection
     COLLECT_CLIENT_INFO = True    # Recopilar información de red del cliente
@@ -55,26 +106,54 @@ class Config:
     DEBUG_MODE = False            # Mostrar información de debug detallada
     VERBOSE_SCANNING = True       # Mostrar detalles durante escaneo
     
-    # Performance thresholds
-    SIGNAL_QUALITY_THRESHOLDS = {
+    # Performance thresholds (tablas de solo lectura)
+    SIGNAL_QUALITY_THRESHOLDS = MappingProxyType({
         "excellent": 40,  # SNR >= 40 dB
         "very_good": 30,  # SNR >= 30 dB  
         "good": 20,       # SNR >= 20 dB
         "fair": 15,       # SNR >= 15 dB
         # < 15 dB = poor
-    }
+    })
     
     # UDP Quality thresholds
-    UDP_QUALITY_THRESHOLDS = {
-        "excellent": {"loss": 0.1, "jitter": 2.0},    # < 0.1% loss, < 2ms jitter
-        "good": {"loss": 0.5, "jitter": 5.0},         # < 0.5% loss, < 5ms jitter
-        "acceptable": {"loss": 1.0, "jitter": 10.0},  # < 1.0% loss, < 10ms jitter
+    UDP_QUALITY_THRESHOLDS = MappingProxyType({
+        "excellent": MappingProxyType({"loss": 0.1, "jitter": 2.0}),    # < 0.1% loss, < 2ms jitter
+        "good": MappingProxyType({"loss": 0.5, "jitter": 5.0}),         # < 0.5% loss, < 5ms jitter
+        "acceptable": MappingProxyType({"loss": 1.0, "jitter": 10.0}),  # < 1.0% loss, < 10ms jitter
         # >= 1.0% loss = problematic
-    }
+    })
     
     # Noise floor estimates (dBm)
-    NOISE_FLOOR = {
+    NOISE_FLOOR = MappingProxyType({
         "2.4GHz": -95,  # Typical noise floor for 2.4GHz
         "5GHz": -100,   # Typical noise floor for 5GHz
         "6GHz": -100    # Typical noise floor for 6GHz (WiFi 6E)
-    }
+    })
+    
+    @classmethod
+    def from_env(cls):
+        """Aplica overrides desde variables de entorno (p.ej. IPERF_SERVER=192.168.1.10)."""
+        overrides = {
+            "IPERF_PATH": str,
+            "SPEEDTEST_PATH": str,
+            "IPERF_SERVER": str,
+            "PING_TARGET": str,
+            "DATA_DIR": Path,
+            "INTERVAL_MINUTES": float,
+            "MEASUREMENT_INTERVAL": int,
+        }
+        for name, cast in overrides.items():
+            value = os.environ.get(name)
+            if value:
+                setattr(cls, name, cast(value))
+        return cls
+
+
+Config.from_env()
+
+# Config es la única fuente de verdad. Estos nombres existen para los
+# scripts de services/ que hacen "from config.config import IPERF_SERVER".
+IPERF_PATH = Config.IPERF_PATH
+SPEEDTEST_PATH = Config.SPEEDTEST_PATH
+IPERF_SERVER = Config.IPERF_SERVER
+INTERVAL_MINUTES = Config.INTERVAL_MINUTES
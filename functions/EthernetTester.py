@@ -1,40 +1,184 @@
+import asyncio
+import atexit
+import ipaddress
+import json
+import re
+import socket
 import subprocess
+import threading
+import time
+from config.config import Config, resolve_iperf_path
+
+# Cache de interfaces: netsh tarda y la topología cableada casi no cambia
+_IFACE_TTL = 15
+_iface_cache = {"ts": 0.0, "data": None}
+_iface_lock = threading.Lock()
+
+# Tabla de "netsh interface show interface": estado admin, estado, tipo, nombre
+# (se trabaja sobre bytes; solo se decodifica el nombre de las que se devuelven)
+_IFACE_RE = re.compile(rb'^\s*(\S+)\s+(\S+)\s+\S+\s+(.+?)\s*$', re.IGNORECASE)
+_CONNECTED = frozenset((b"conectado", b"connected"))
+_HEADER_TOKENS = frozenset((b"admin", b"administrative", b"estado"))
+
+# Servidores iperf3 locales reutilizados entre tests (puerto -> Popen)
+_server_procs = {}
+
+def _is_loopback(server):
+    """True si el servidor iperf3 es esta misma máquina."""
+    if server.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(server).is_loopback
+    except ValueError:
+        return False
+
+def _port_listening(port):
+    """True si algo acepta conexiones en ese puerto local."""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+def _ensure_server(iperf, port=None):
+    """Arranca (una sola vez) un iperf3 -s local en el puerto indicado.
+    
+    Si ya hay un servidor escuchando (p.ej. uno iniciado a mano) no se lanza otro.
+    """
+    proc = _server_procs.get(port)
+    if proc is not None and proc.poll() is None:
+        return
+    if _port_listening(port or 5201):
+        return
+    cmd = [iperf, "-s"] + (["-p", str(port)] if port else [])
+    proc = _server_procs[port] = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)  # dar tiempo a que abra el puerto
+    if proc.poll() is not None:
+        print(f"⚠️ El servidor iperf3 local (puerto {port or 5201}) terminó al arrancar "
+              f"(código {proc.returncode}); el test probablemente falle")
+
+@atexit.register
+def _stop_servers():
+    """Detiene los servidores iperf3 locales al salir."""
+    for proc in _server_procs.values():
+        if proc.poll() is None:
+            proc.terminate()
 
 class EthernetTester:
     """Tester para conexiones cableadas Gigabit."""
     
     @staticmethod
-    def get_ethernet_interfaces():
-        """Obtener interfaces Ethernet disponibles."""
+    def get_ethernet_interfaces(force_refresh=False):
+        """Obtener interfaces Ethernet disponibles (cacheadas _IFACE_TTL segundos)."""
+        with _iface_lock:
+            if (not force_refresh and _iface_cache["data"] is not None
+                    and time.monotonic() - _iface_cache["ts"] < _IFACE_TTL):
+                return list(_iface_cache["data"])
+        
         try:
             result = subprocess.run(
                 ["netsh", "interface", "show", "interface"],
                 capture_output=True,
-                text=True,
                 timeout=10
             )
             
             ethernet_interfaces = []
             for line in result.stdout.splitlines():
-                if "ethernet" in line.lower() or "local" in line.lower():
-                    # Parse interface info
-                    parts = line.split()
-                    if len(parts) >= 4 and ("conectado" in line.lower() or "connected" in line.lower()):
-                        ethernet_interfaces.append({
-                            "name": " ".join(parts[3:]),
-                            "status": "connected",
-                            "type": "ethernet"
-                        })
+                m = _IFACE_RE.match(line)
+                if not m or m.group(1).lower() in _HEADER_TOKENS:
+                    continue
+                # Solo conectadas ("desconectado" ya no cuenta como conectado)
+                if m.group(2).lower() not in _CONNECTED:
+                    continue
+                lowered = m.group(3).lower()
+                if b"ethernet" in lowered or b"local" in lowered:
+                    ethernet_interfaces.append({
+                        "name": m.group(3).decode("cp1252", errors="replace"),
+                        "status": "connected",
+                        "type": "ethernet"
+                    })
+            
+            with _iface_lock:
+                _iface_cache["data"] = ethernet_interfaces
+                _iface_cache["ts"] = time.monotonic()
             
-            return ethernet_interfaces
+            return list(ethernet_interfaces)
             
         except Exception as e:
             print(f"Error getting ethernet interfaces: {e}")
             return []
     
     @staticmethod
-    def test_ethernet_speed(interface_name="Ethernet", server="iperf.he.net", duration=10):
-        """Test de velocidad en conexión cableada."""
+    async def _run_json(argv, timeout):
+        """Lanza iperf3 con -J y devuelve su salida JSON ya parseada."""
+        proc = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        finally:
+            # Timeout o cancelación: no dejar procesos iperf3 colgados
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+        if not stdout.strip():
+            raise RuntimeError(stderr.decode(errors="replace").strip() or f"iperf3 returncode {proc.returncode}")
+        data = json.loads(stdout)
+        if "error" in data:
+            raise RuntimeError(data["error"])
+        return data
+    
+    @staticmethod
+    def _tcp_metrics(data):
+        """Extrae throughput TCP del bloque end de iperf3."""
+        sent = data["end"]["sum_sent"]
+        received = data["end"]["sum_received"]
+        return {
+            "sent_mbps": sent["bits_per_second"] / 1_000_000,
+            "received_mbps": received["bits_per_second"] / 1_000_000,
+            "retransmits": sent.get("retransmits", 0)
+        }
+    
+    @staticmethod
+    def _udp_metrics(data):
+        """Extrae throughput, jitter y pérdida UDP del bloque end de iperf3."""
+        total = data["end"]["sum"]
+        lost_percent = total.get("lost_percent", 0.0)
+        jitter = total.get("jitter_ms", 0.0)
+        
+        quality = "PROBLEMÁTICA"
+        for level, label in (("excellent", "EXCELENTE"), ("good", "BUENA"), ("acceptable", "ACEPTABLE")):
+            limits = Config.UDP_QUALITY_THRESHOLDS[level]
+            if lost_percent < limits["loss"] and jitter < limits["jitter"]:
+                quality = label
+                break
+        
+        return {
+            "actual_mbps": total["bits_per_second"] / 1_000_000,
+            "jitter_ms": jitter,
+            "lost_percent": lost_percent,
+            "lost_packets": total.get("lost_packets", 0),
+            "total_packets": total.get("packets", 0),
+            "quality": quality
+        }
+        
+    @staticmethod
+    async def _gather(*jobs):
+        """Ejecuta varias corrutinas a la vez dentro del mismo event loop."""
+        return await asyncio.gather(*jobs)
+    
+    @staticmethod
+    def test_ethernet_speed(interface_name="Ethernet", server="iperf.he.net", duration=10, udp_port=None):
+        """Test de velocidad en conexión cableada.
+        
+        Si se indica udp_port (un segundo servidor iperf3 escuchando en ese
+        puerto), los tests TCP y UDP corren en paralelo; si no, uno tras otro.
+        En paralelo ambos comparten el mismo enlace: cada resultado incluye el
+        tráfico del otro y no es comparable con una corrida secuencial
+        (el resultado lleva "parallel": True).
+        """
         print(f"\n🌐 TESTING ETHERNET CONNECTION: {interface_name}")
         print("=" * 60)
         
@@ -43,15 +187,15 @@ class EthernetTester:
             result = subprocess.run(
                 ["netsh", "interface", "ip", "show", "config", interface_name],
                 capture_output=True,
-                text=True,
                 timeout=10
             )
             
             if result.returncode == 0:
+                # Solo se decodifican las primeras 10 líneas que se muestran
+                head = result.stdout.split(b"\n", 10)[:10]
+                lines = [line.strip().decode("cp1252", errors="replace") for line in head]
                 print("📋 Interface Information:")
-                for line in result.stdout.splitlines()[:10]:
-                    if line.strip():
-                        print(f"   {line.strip()}")
+                print("\n".join(f"   {line}" for line in lines if line))
             
         except Exception as e:
             print(f"⚠️ Could not get interface info: {e}")
@@ -62,53 +206,52 @@ class EthernetTester:
         print(f"   Duration: {duration} seconds")
         print("   " + "="*50)
         
-        try:
-            # TCP test con salida en tiempo real
-            process = subprocess.Popen(
-                ["C:\\iperf3\\iperf3.exe\\iperf3.exe", "-c", server, "-t", str(duration), "-i", "1"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            tcp_lines = []
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    print(f"   {output.strip()}")
-                    tcp_lines.append(output)
-            
-            process.wait(timeout=duration + 10)
+        iperf = resolve_iperf_path(Config.IPERF_PATH)
+        if iperf is None:
+            return {"success": False, "error": "iperf3 not found"}
+        
+        if _is_loopback(server):
+            _ensure_server(iperf)
+            if udp_port:
+                _ensure_server(iperf, udp_port)
+        
+        timing = ("-t", str(duration), "-J")
+        tcp_cmd = (iperf, "-c", server, *Config.ETHERNET_TCP_OPTIONS, *timing)
+        udp_cmd = (iperf, "-c", server, "-u", "-b", "1G", "-l", str(Config.UDP_PACKET_SIZE), *timing)
+        if udp_port:
+            udp_cmd += ("-p", str(udp_port))
+        
+        timeout = duration + 10
             
-            # Test UDP a 1 Gbps
-            print(f"\n🔄 Running UDP Test at 1 Gbps...")
-            print("   " + "="*50)
+        try:
+            if udp_port:
+                # TCP y UDP en paralelo contra puertos distintos
+                print(f"🔄 Running TCP + UDP (1 Gbps, port {udp_port}) in parallel...")
+                print("   ⚠️ TCP y UDP comparten el enlace: los números no son comparables con el modo secuencial")
+                tcp_data, udp_data = asyncio.run(EthernetTester._gather(
+                    EthernetTester._run_json(tcp_cmd, timeout),
+                    EthernetTester._run_json(udp_cmd, timeout)
+                ))
+            else:
+                print("🔄 Running TCP Test...")
+                tcp_data = asyncio.run(EthernetTester._run_json(tcp_cmd, timeout))
             
-            udp_process = subprocess.Popen(
-                ["C:\\iperf3\\iperf3.exe\\iperf3.exe", "-c", server, "-u", "-b", "1G", "-t", str(duration), "-i", "1"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
+                # Test UDP a 1 Gbps
+                print(f"🔄 Running UDP Test at 1 Gbps...")
+                udp_data = asyncio.run(EthernetTester._run_json(udp_cmd, timeout))
             
-            while True:
-                output = udp_process.stdout.readline()
-                if output == '' and udp_process.poll() is not None:
-                    break
-                if output:
-                    print(f"   {output.strip()}")
+            tcp = EthernetTester._tcp_metrics(tcp_data)
+            udp = EthernetTester._udp_metrics(udp_data)
             
-            udp_process.wait(timeout=duration + 10)
+            print("\n📊 RESULTADOS ETHERNET")
+            print(f"   TCP: {tcp['sent_mbps']:.1f} Mbps enviados, {tcp['received_mbps']:.1f} Mbps recibidos "
+                  f"({tcp['retransmits']} retransmisiones)")
+            print(f"   UDP: {udp['actual_mbps']:.1f} Mbps, jitter {udp['jitter_ms']:.2f} ms, "
+                  f"pérdida {udp['lost_percent']:.2f}% ({udp['quality']})")
             
-            return {"success": True, "raw_output": "".join(tcp_lines)}
+            return {"success": True, "interface": interface_name, "server": server,
+                    "parallel": bool(udp_port), "tcp": tcp, "udp": udp}
             
         except Exception as e:
             print(f"❌ Error durante test Ethernet: {e}")
             return {"success": False, "error": str(e)}
-
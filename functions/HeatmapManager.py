@@ -1,17 +1,289 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from scipy.interpolate import griddata
 from collections import defaultdict
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from operator import itemgetter
 from datetime import datetime
 from functions.WifiScanner import WiFiScanner
 from functions.NetworkTester import NetworkTester
 from config.config import Config
 import json
+import os
 import subprocess
 import re
+import sys
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba es opcional: sin él la congestión se calcula con NumPy
+    njit = None
+
+
+# Campos que siempre trae cada red del escaneo (ruta rápida con itemgetter)
+_HOT_FIELDS = itemgetter('ssid', 'bssid', 'signal_percentage', 'channel', 'authentication')
+_BASIC_KEYS = ('ssid', 'bssid', 'signal', 'channel', 'authentication')
+
+# La IP del cliente casi no cambia durante una medición: ipconfig se reutiliza este tiempo
+_CLIENT_INFO_TTL = 30
+
+_IPV4_RE = re.compile(r'(\d+\.\d+\.\d+\.\d+)')
+
+# Filtro previo de líneas de ipconfig: solo cabeceras de adaptador o claves de _IPCONFIG_FIELDS
+_IPCONFIG_LINE_RE = re.compile(r'[Aa]dapt|IPv4|Subnet|subred|Gateway|Puerta|DNS')
+
+# Claves de "ipconfig /all" (en minúsculas, inglés y español) -> campo de client_info
+_IPCONFIG_FIELDS = (
+    ('ipv4', 'client_ip'),
+    ('subnet mask', 'subnet_mask'),
+    ('máscara de subred', 'subnet_mask'),
+    ('default gateway', 'gateway'),
+    ('puerta de enlace predeterminada', 'gateway'),
+    ('dns servers', 'dns_servers'),
+    ('servidores dns', 'dns_servers')
+)
+_IPCONFIG_LABELS = {
+    'client_ip': '📍 IP Cliente',
+    'subnet_mask': '🌐 Máscara',
+    'gateway': '🚪 Gateway',
+    'dns_servers': '🔍 DNS'
+}
+
+# Timestamp ISO -> parte de nombre de archivo, en una sola pasada
+_TS_FILENAME = str.maketrans({':': '-', '.': '_'})
+
+# Textos de pocas variantes que se repiten en cada medición: se internan al ingresar
+_INTERNED_FIELDS = ('ssid', 'bssid', 'band', 'authentication', 'signal_quality')
+
+
+def _intern_networks(networks):
+    """Internar in-place los campos de texto repetidos de cada red."""
+    for net in networks:
+        for field in _INTERNED_FIELDS:
+            value = net.get(field)
+            if type(value) is str:
+                net[field] = sys.intern(value)
+    return networks
+
+
+def _extract_net_data(networks, full=True):
+    """Lista 'networks' de una medición a partir del escaneo (sin BSSID desconocidos).
+    
+    Con full=False solo se guardan los campos básicos (formato antiguo con coordenadas).
+    """
+    known = [n for n in networks if n['bssid'] != "Unknown"]
+    if not full:
+        return _intern_networks([dict(zip(_BASIC_KEYS, _HOT_FIELDS(n))) for n in known])
+    return _intern_networks([
+        {
+            'ssid': ssid,
+            'bssid': bssid,
+            'signal': signal,
+            'signal_dbm': n.get('signal_dbm'),
+            'snr_db': n.get('snr_db'),
+            'signal_quality': n.get('signal_quality'),
+            'channel': channel,
+            'band': n.get('band'),
+            'authentication': authentication
+        }
+        for n in known
+        for ssid, bssid, signal, channel, authentication in (_HOT_FIELDS(n),)
+    ])
+
+
+@dataclass(frozen=True)
+class TestPlan:
+    """Tests a ejecutar en cada red o medición (se decide una vez, no durante los tests)."""
+    run_ping: bool = True
+    run_speedtest: bool = False
+    run_iperf: bool = False
+    min_signal_for_speedtest: int = 40
+
+
+DEFAULT_PLAN = TestPlan()
+
+
+# Columnas del almacén global de muestras por AP
+_AP_COLUMNS = (
+    ('ap_id', np.int32),
+    ('x', np.float32),
+    ('y', np.float32),
+    ('signal', np.float32),
+    ('ts', 'datetime64[us]')
+)
+
+
+# Columnas del almacén de resultados de tests con coordenadas (NaN si el test no se hizo)
+_PERF_COLUMNS = (
+    ('ap_id', np.int32),
+    ('x', np.float32),
+    ('y', np.float32),
+    ('ping_ms', np.float32),
+    ('dl_mbps', np.float32)
+)
+
+# A partir de cuántas muestras vale la pena repartir las grillas del compuesto en procesos
+_PARALLEL_MIN_SAMPLES = 200_000
+
+
+def _grid_cells(x, y, nx, ny, resolution):
+    """Índice plano de celda (fila=y, columna=x) para cada punto."""
+    ix = np.clip((x / resolution).astype(np.intp), 0, nx - 1)
+    iy = np.clip((y / resolution).astype(np.intp), 0, ny - 1)
+    return iy * nx + ix
+
+
+def _compute_ap_density_grid(ap_id, x, y, signal, nx, ny, resolution, threshold):
+    """Número de APs distintos con señal > threshold en cada celda."""
+    strong = signal > threshold
+    cells = _grid_cells(x[strong], y[strong], nx, ny, resolution)
+    # Un AP cuenta una sola vez por celda aunque tenga varias muestras en ella
+    pairs = np.unique(ap_id[strong].astype(np.intp) * (nx * ny) + cells)
+    counts = np.bincount(pairs % (nx * ny), minlength=nx * ny)
+    return counts.astype(np.int16).reshape(ny, nx)
+
+
+def _compute_max_grid(x, y, values, nx, ny, resolution):
+    """Valor máximo medido en cada celda (0 donde no hay muestras)."""
+    grid = np.zeros(nx * ny, dtype=np.float32)
+    np.maximum.at(grid, _grid_cells(x, y, nx, ny, resolution), values)
+    return grid.reshape(ny, nx)
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _congestion_kernel(cx, cy, px, py, starts, weights, radius2, out):
+        """Kernel compilado: por celda, cada canal suma una vez al primer punto que llega; filas en paralelo."""
+        n_groups = starts.shape[0]
+        for i in prange(cy.shape[0]):
+            for j in range(cx.shape[0]):
+                total = 0.0
+                for g in range(n_groups):
+                    end = starts[g + 1] if g + 1 < n_groups else px.shape[0]
+                    for k in range(starts[g], end):
+                        dx = cx[j] - px[k]
+                        dy = cy[i] - py[k]
+                        if dx * dx + dy * dy <= radius2:
+                            total += weights[g]
+                            break
+                out[i, j] = total
+        return out
+else:
+    _congestion_kernel = None
+
+
+def _compute_channel_congestion_grid(x, y, channel, nx, ny, resolution, radius, top=3):
+    """Congestión por celda a partir de los canales más usados.
+    
+    Cada uno de los top canales con más apariciones (y al menos 3 con
+    coordenadas) suma su número de apariciones en las celdas a menos de
+    radius de algún punto donde se vio. Las distancias a los puntos de todos
+    los canales se calculan en una sola pasada y luego se reducen por canal.
+    x, y son NaN para apariciones sin coordenadas.
+    Con numba instalado se usa el kernel compilado, sin la matriz (ny, nx, P).
+    """
+    grid = np.zeros((ny, nx), dtype=np.float32)
+    channels, inverse, counts = np.unique(channel, return_inverse=True, return_counts=True)
+    located = ~np.isnan(x)
+    
+    # Solo compiten los canales con al menos 3 apariciones ubicadas
+    eligible = np.flatnonzero(np.bincount(inverse[located], minlength=len(channels)) >= 3)
+    if not len(eligible):
+        return grid
+    selected = channels[eligible[np.argsort(counts[eligible], kind='stable')[::-1][:top]]]
+    
+    # Puntos de los canales elegidos, agrupados por canal
+    chosen = located & np.isin(channel, selected)
+    order = np.argsort(channel[chosen], kind='stable')
+    px, py, pc = x[chosen][order], y[chosen][order], channel[chosen][order]
+    starts = np.flatnonzero(np.r_[True, pc[1:] != pc[:-1]])
+    weights = counts[np.searchsorted(channels, pc[starts])].astype(np.float32)
+    
+    # Centros de celda contra todos los puntos a la vez: (ny, nx, P) -> (ny, nx, canales)
+    cx = (np.arange(nx, dtype=np.float32) + 0.5) * resolution
+    cy = (np.arange(ny, dtype=np.float32) + 0.5) * resolution
+    if _congestion_kernel is not None:
+        return _congestion_kernel(cx, cy, px, py, starts, weights, float(radius * radius), grid)
+    
+    near = (cx[None, :, None] - px) ** 2 + (cy[:, None, None] - py) ** 2 <= radius * radius
+    reached = np.logical_or.reduceat(near, starts, axis=-1)
+    return np.matmul(reached, weights, out=grid)
+
+
+def _compute_best_grid(x, y, values, labels, nx, ny, resolution):
+    """Mejor valor por celda y el índice (labels) de quién lo dio; -1 donde no hay muestras."""
+    best = np.zeros(nx * ny, dtype=np.float32)
+    best_label = np.full(nx * ny, -1, dtype=np.int16)
+    cells = _grid_cells(x, y, nx, ny, resolution)
+    
+    # Ordenar por celda y valor: el último de cada tramo es el máximo de la celda
+    order = np.lexsort((values, cells))
+    cells = cells[order]
+    last = np.r_[cells[1:] != cells[:-1], True] if len(cells) else np.empty(0, dtype=bool)
+    best[cells[last]] = values[order][last]
+    best_label[cells[last]] = labels[order][last]
+    return best.reshape(ny, nx), best_label.reshape(ny, nx)
+
+
+def _empty_store(columns, capacity=64):
+    """Buffers vacíos para un almacén columnar (_AP_COLUMNS o _PERF_COLUMNS)."""
+    return {name: np.empty(capacity, dtype=dtype) for name, dtype in columns}
+
+
+def _reserve_row(store, n):
+    """Asegurar lugar para la fila n; crecimiento por duplicación (copia amortizada O(1))."""
+    if n == len(store['ap_id']):
+        for name, column in store.items():
+            grown = np.empty(2 * n, dtype=column.dtype)
+            grown[:n] = column
+            store[name] = grown
+
+
+def _performance_score(ping_ms, dl_mbps):
+    """Puntaje 0-100: 30% latencia (100 - ping) y 70% descarga (Mbps, tope 100); NaN no suma."""
+    ping_score = np.nan_to_num(np.clip(100.0 - ping_ms, 0.0, 100.0))
+    speed_score = np.nan_to_num(np.clip(dl_mbps, 0.0, 100.0))
+    return 0.3 * ping_score + 0.7 * speed_score
+
+
+def _dumps(obj, indent=False):
+    """Serializa a JSON en bytes (orjson si está instalado, si no json estándar).
+    
+    Compacto por defecto; con indent=True usa 2 espacios para archivos que se leen a mano.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _loads(raw):
+    """Parsea JSON desde bytes."""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _print_lines(lines):
+    """Imprime varias líneas con una sola escritura a stdout (la consola de Windows es lenta)."""
+    if lines:
+        sys.stdout.write('\n'.join(lines) + '\n')
+
+
+def _write_atomic(path, data):
+    """Escribe bytes en un temporal y lo cambia por path: nunca queda un archivo a medias."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
 
 class HeatmapManager:
     """Manages persistent heatmaps with network testing and individual file storage."""
@@ -29,13 +301,40 @@ class HeatmapManager:
         self.ap_details_dir = self.data_dir / "ap_details"
         self.ap_details_dir.mkdir(exist_ok=True)
         
+        # Todas las mediciones, una por línea: save_data lo compacta y las nuevas se añaden al final
+        self._measurements_jsonl = self.data_dir / "measurements.jsonl"
+        # Asignaciones ID -> coordenadas hechas desde el último snapshot
+        self._mappings_jsonl = self.data_dir / "mappings.jsonl"
+        # Muestras por AP en columnas binarias (x, y, señal, timestamp)
+        self._ap_data_npz = self.data_dir / "ap_data.npz"
+        
         self.scanner = WiFiScanner()
         self.tester = NetworkTester()
         self.rooms = {}
         self.measurements = []
-        self.ap_data = defaultdict(list)
+        # Bytes de measurements.jsonl que ya cubre el último snapshot (ap_data.npz incluido)
+        self._measurements_snapshot_size = 0
+        # Muestras de señal de todos los APs en columnas; ap_id indexa _ap_id_to_key
+        self._ap_store = _empty_store(_AP_COLUMNS)
+        self._ap_len = 0
+        self._ap_id_to_key = []
+        self._ap_key_to_id = {}
+        self._ap_key_cache = {}  # (ssid, bssid) -> clave interned de ap_data
+        self._ap_names = {}  # clave -> (ssid, bssid), para no partir la clave en cada uso
+        # Agregados de señal por ap_id, al día con cada muestra (para get_statistics)
+        self._ap_agg = {'count': [], 'sum': [], 'max': [], 'min': []}
+        # Resultados de tests en columnas; ap_id indexa _perf_keys
+        self._perf_store = _empty_store(_PERF_COLUMNS)
+        self._perf_len = 0
+        self._perf_keys = []
+        self._perf_key_to_id = {}
+        self._perf_cache = {}  # ap_key -> (points, scores) ya calculados
         self.network_test_results = defaultdict(list)
         
+        # Última info de red del cliente válida y cuándo se obtuvo (monotonic)
+        self._client_info_cache = None
+        self._client_info_ts = 0.0
+        
         # New: ID to coordinates mapping
         self.id_mapping = {}
         self.next_measurement_id = 1
@@ -44,7 +343,24 @@ class HeatmapManager:
         self.load_data()
     
     def get_current_client_ip_info(self):
-        """Obtener información detallada de IP del cliente actual - VERSIÓN MEJORADA."""
+        """Obtener información detallada de IP del cliente actual (cacheada _CLIENT_INFO_TTL segundos)."""
+        cached = self._client_info_cache
+        if cached is not None and time.monotonic() - self._client_info_ts < _CLIENT_INFO_TTL:
+            return dict(cached, dns_servers=list(cached['dns_servers']))
+        
+        client_info = self._fetch_client_ip_info()
+        if client_info.get('client_ip'):
+            self._client_info_cache = dict(client_info, dns_servers=list(client_info.get('dns_servers', [])))
+            self._client_info_ts = time.monotonic()
+        return client_info
+    
+    def _connect_to_network(self, ssid):
+        """Conectar a ssid; la info de IP cacheada deja de valer (incluso si falla, ya se soltó la red anterior)."""
+        self._client_info_cache = None
+        return self.scanner.connect_to_network(ssid)
+    
+    def _fetch_client_ip_info(self):
+        """Consultar NetworkTester o ipconfig /all por la información de red del cliente."""
         client_info = {
             'client_ip': None,
             'gateway': None,
@@ -86,8 +402,12 @@ class HeatmapManager:
             
             current_interface = None
             in_wifi_section = False
+            found = []
             
             for line in result.stdout.splitlines():
+                # La mayoría de las líneas no interesan: se descartan sin strip ni split
+                if not _IPCONFIG_LINE_RE.search(line):
+                    continue
                 line = line.strip()
                 
                 # Detectar inicio de sección WiFi
@@ -96,7 +416,7 @@ class HeatmapManager:
                         current_interface = line
                         client_info['interface_name'] = current_interface
                         in_wifi_section = True
-                        print(f"      📡 Interfaz WiFi encontrada: {current_interface}")
+                        found.append(f"      📡 Interfaz WiFi encontrada: {current_interface}")
                         continue
                 elif "adapter" in line.lower() or "adaptador" in line.lower():
                     # Nueva sección de adaptador, salir de WiFi
@@ -105,41 +425,24 @@ class HeatmapManager:
                 
                 # Solo procesar si estamos en la sección WiFi correcta
                 if in_wifi_section and ":" in line:
-                    try:
-                        key, value = line.split(":", 1)
-                        key = key.strip()
-                        value = value.strip()
-                        
-                        # IPv4 Address
-                        if ("IPv4" in key or "Dirección IPv4" in key) and value:
-                            ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', value)
-                            if ip_match:
-                                client_info['client_ip'] = ip_match.group(1)
-                                print(f"      📍 IP Cliente: {client_info['client_ip']}")
-                        
-                        # Subnet Mask
-                        elif ("Subnet Mask" in key or "Máscara de subred" in key) and value:
-                            ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', value)
-                            if ip_match:
-                                client_info['subnet_mask'] = ip_match.group(1)
-                                print(f"      🌐 Máscara: {client_info['subnet_mask']}")
-                        
-                        # Default Gateway
-                        elif ("Default Gateway" in key or "Puerta de enlace predeterminada" in key) and value:
-                            ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', value)
-                            if ip_match:
-                                client_info['gateway'] = ip_match.group(1)
-                                print(f"      🚪 Gateway: {client_info['gateway']}")
+                    key, value = line.split(":", 1)
+                    value = value.strip()
+                    if not value:
+                        continue
                         
-                        # DNS Servers
-                        elif ("DNS Servers" in key or "Servidores DNS" in key) and value:
-                            ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', value)
-                            if ip_match:
-                                client_info['dns_servers'].append(ip_match.group(1))
-                                print(f"      🔍 DNS: {ip_match.group(1)}")
-                    
-                    except ValueError:
+                    # IPv4, máscara, gateway o DNS según la clave; el regex solo en esas líneas
+                    key = key.lower()
+                    field = next((f for token, f in _IPCONFIG_FIELDS if token in key), None)
+                    if field is None:
                         continue
+                    ip_match = _IPV4_RE.search(value)
+                    if ip_match:
+                        if field == 'dns_servers':
+                            client_info['dns_servers'].append(ip_match.group(1))
+                        else:
+                            client_info[field] = ip_match.group(1)
+                        found.append(f"      {_IPCONFIG_LABELS[field]}: {ip_match.group(1)}")
+            _print_lines(found)
             
             # Verificar que obtuvimos la información básica
             if not client_info['client_ip']:
@@ -159,34 +462,50 @@ class HeatmapManager:
     def save_individual_measurement(self, measurement):
         """Guardar medición individual en archivo separado."""
         try:
-            timestamp = measurement.get('timestamp', datetime.now().isoformat())
-            measurement_id = measurement.get('id', f"manual_{int(datetime.now().timestamp())}")
+            # datetime.now() solo si falta el dato (el default de get se evalúa siempre)
+            timestamp = measurement.get('timestamp') or datetime.now().isoformat()
+            measurement_id = measurement.get('id')
+            if measurement_id is None:
+                measurement_id = f"manual_{int(datetime.now().timestamp())}"
+            ts_safe = timestamp.translate(_TS_FILENAME)
             
             # Crear nombre de archivo único
-            filename = f"measurement_{measurement_id}_{timestamp.replace(':', '-').replace('.', '_')}.json"
+            filename = f"measurement_{measurement_id}_{ts_safe}.json"
             filepath = self.individual_measurements_dir / filename
             
-            # Verificar si ya tiene client_network_info, si no, obtenerla
-            if 'client_network_info' not in measurement or not measurement['client_network_info'].get('client_ip'):
+            # Solo consultar si nunca se obtuvo: un resultado sin client_ip (sin conexión) también vale
+            if measurement.get('client_network_info') is None:
                 print("   🔄 Obteniendo información de cliente para el archivo...")
                 client_info = self.get_current_client_ip_info()
                 measurement['client_network_info'] = client_info
             else:
                 client_info = measurement['client_network_info']
             
+            # Orden por señal una sola vez: el primero es el AP más fuerte
+            nets_sorted = sorted(measurement.get('networks') or [],
+                                 key=lambda x: x.get('signal', 0), reverse=True)
+            
             # Agregar resumen de APs para fácil lectura
             measurement['ap_summary'] = {
-                'total_aps_found': len(measurement.get('networks', [])),
+                'total_aps_found': len(nets_sorted),
                 'strongest_ap': None,
                 'client_ip': client_info.get('client_ip', 'N/A'),
                 'gateway': client_info.get('gateway', 'N/A'),
-                'ap_list': []
+                'ap_list': [{
+                    'ssid': network.get('ssid'),
+                    'bssid': network.get('bssid'),
+                    'signal_percentage': network.get('signal', 0),
+                    'signal_dbm': network.get('signal_dbm'),
+                    'snr_db': network.get('snr_db'),
+                    'channel': network.get('channel'),
+                    'band': network.get('band'),
+                    'signal_quality': network.get('signal_quality'),
+                    'authentication': network.get('authentication')
+                } for network in nets_sorted]
             }
             
-            # Procesar información de APs
-            if measurement.get('networks'):
-                # Encontrar AP más fuerte
-                strongest = max(measurement['networks'], key=lambda x: x.get('signal', 0))
+            if nets_sorted:
+                strongest = nets_sorted[0]
                 measurement['ap_summary']['strongest_ap'] = {
                     'ssid': strongest.get('ssid'),
                     'bssid': strongest.get('bssid'),
@@ -195,37 +514,16 @@ class HeatmapManager:
                     'channel': strongest.get('channel'),
                     'band': strongest.get('band')
                 }
-                
-                # Lista resumida de todos los APs
-                for network in measurement['networks']:
-                    ap_info = {
-                        'ssid': network.get('ssid'),
-                        'bssid': network.get('bssid'),
-                        'signal_percentage': network.get('signal', 0),
-                        'signal_dbm': network.get('signal_dbm'),
-                        'snr_db': network.get('snr_db'),
-                        'channel': network.get('channel'),
-                        'band': network.get('band'),
-                        'signal_quality': network.get('signal_quality'),
-                        'authentication': network.get('authentication')
-                    }
-                    measurement['ap_summary']['ap_list'].append(ap_info)
-                
-                # Ordenar por señal
-                measurement['ap_summary']['ap_list'].sort(
-                    key=lambda x: x.get('signal_percentage', 0), reverse=True
-                )
             
             # Guardar archivo individual
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(measurement, f, indent=2, ensure_ascii=False)
+            _write_atomic(filepath, _dumps(measurement, indent=Config.PRETTY_JSON))
             
             print(f"💾 Medición individual guardada: {filename}")
             print(f"   📍 Cliente IP: {measurement['ap_summary']['client_ip']}")
             print(f"   🚪 Gateway: {measurement['ap_summary']['gateway']}")
             
             # También crear archivo de resumen legible
-            summary_filename = f"summary_{measurement_id}_{timestamp.replace(':', '-').replace('.', '_')}.txt"
+            summary_filename = f"summary_{measurement_id}_{ts_safe}.txt"
             summary_filepath = self.individual_measurements_dir / summary_filename
             self.create_measurement_summary_file(measurement, summary_filepath)
             
@@ -240,88 +538,88 @@ class HeatmapManager:
     def create_measurement_summary_file(self, measurement, filepath):
         """Crear archivo de resumen legible de la medición."""
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("=" * 80 + "\n")
-                f.write("RESUMEN DE MEDICIÓN WIFI\n")
-                f.write("=" * 80 + "\n\n")
-                
-                # Información básica
-                f.write(f"ID de Medición: {measurement.get('id', 'N/A')}\n")
-                f.write(f"Timestamp: {measurement.get('timestamp', 'N/A')}\n")
-                
-                location = measurement.get('location')
-                if location:
-                    f.write(f"Ubicación: ({location.get('x', 'N/A')}, {location.get('y', 'N/A')})\n")
-                else:
-                    f.write("Ubicación: No mapeada aún\n")
-                
-                # Información de red del cliente
-                client_info = measurement.get('client_network_info', {})
-                f.write(f"\nINFORMACIÓN DE RED DEL CLIENTE:\n")
-                f.write(f"IP Cliente: {client_info.get('client_ip', 'N/A')}\n")
-                f.write(f"Gateway: {client_info.get('gateway', 'N/A')}\n")
-                f.write(f"Máscara de subred: {client_info.get('subnet_mask', 'N/A')}\n")
-                if client_info.get('dns_servers'):
-                    f.write(f"DNS: {', '.join(client_info.get('dns_servers', []))}\n")
-                f.write(f"Interfaz: {client_info.get('interface_name', 'N/A')}\n")
-                
-                # Resumen de APs
-                ap_summary = measurement.get('ap_summary', {})
-                f.write(f"\nRESUMEN DE ACCESS POINTS:\n")
-                f.write(f"Total APs encontrados: {ap_summary.get('total_aps_found', 0)}\n")
-                
-                strongest = ap_summary.get('strongest_ap')
-                if strongest:
-                    f.write(f"AP más fuerte: {strongest.get('ssid')} ({strongest.get('signal', 0)}%)\n")
-                    f.write(f"  BSSID: {strongest.get('bssid', 'N/A')}\n")
-                    f.write(f"  Señal: {strongest.get('signal_dbm', 'N/A')} dBm\n")
-                    f.write(f"  Canal: {strongest.get('channel', 'N/A')} ({strongest.get('band', 'N/A')})\n")
+            # Todo el texto se arma en memoria y se escribe de una vez
+            lines = ["=" * 80, "RESUMEN DE MEDICIÓN WIFI", "=" * 80 + "\n"]
+            
+            # Información básica
+            lines.append(f"ID de Medición: {measurement.get('id', 'N/A')}")
+            lines.append(f"Timestamp: {measurement.get('timestamp', 'N/A')}")
+            
+            location = measurement.get('location')
+            if location:
+                lines.append(f"Ubicación: ({location.get('x', 'N/A')}, {location.get('y', 'N/A')})")
+            else:
+                lines.append("Ubicación: No mapeada aún")
+            
+            # Información de red del cliente
+            client_info = measurement.get('client_network_info', {})
+            lines.append(f"\nINFORMACIÓN DE RED DEL CLIENTE:")
+            lines.append(f"IP Cliente: {client_info.get('client_ip', 'N/A')}")
+            lines.append(f"Gateway: {client_info.get('gateway', 'N/A')}")
+            lines.append(f"Máscara de subred: {client_info.get('subnet_mask', 'N/A')}")
+            if client_info.get('dns_servers'):
+                lines.append(f"DNS: {', '.join(client_info.get('dns_servers', []))}")
+            lines.append(f"Interfaz: {client_info.get('interface_name', 'N/A')}")
+            
+            # Resumen de APs
+            ap_summary = measurement.get('ap_summary', {})
+            lines.append(f"\nRESUMEN DE ACCESS POINTS:")
+            lines.append(f"Total APs encontrados: {ap_summary.get('total_aps_found', 0)}")
+            
+            strongest = ap_summary.get('strongest_ap')
+            if strongest:
+                lines.append(f"AP más fuerte: {strongest.get('ssid')} ({strongest.get('signal', 0)}%)")
+                lines.append(f"  BSSID: {strongest.get('bssid', 'N/A')}")
+                lines.append(f"  Señal: {strongest.get('signal_dbm', 'N/A')} dBm")
+                lines.append(f"  Canal: {strongest.get('channel', 'N/A')} ({strongest.get('band', 'N/A')})")
+            
+            lines.append(f"\nDETALLE DE TODOS LOS APs:")
+            lines.append("-" * 80)
+            lines.append(f"{'SSID':<25} {'BSSID':<18} {'Señal':<8} {'dBm':<8} {'SNR':<8} {'Canal':<8} {'Banda':<8} {'Calidad':<12}")
+            lines.append("-" * 80)
+            
+            for ap in ap_summary.get('ap_list', []):
+                ssid = (ap.get('ssid', 'N/A'))[:24]
+                bssid = (ap.get('bssid', 'N/A'))[:17]
+                signal = f"{ap.get('signal_percentage', 0)}%"
+                dbm = f"{ap.get('signal_dbm', 0):.1f}" if ap.get('signal_dbm') else "N/A"
+                snr = f"{ap.get('snr_db', 0):.1f}" if ap.get('snr_db') else "N/A"
+                channel = str(ap.get('channel', 'N/A'))
+                band = (ap.get('band', 'N/A'))[:7]
+                quality = (ap.get('signal_quality', 'N/A'))[:11]
                 
-                f.write(f"\nDETALLE DE TODOS LOS APs:\n")
-                f.write("-" * 80 + "\n")
-                f.write(f"{'SSID':<25} {'BSSID':<18} {'Señal':<8} {'dBm':<8} {'SNR':<8} {'Canal':<8} {'Banda':<8} {'Calidad':<12}\n")
-                f.write("-" * 80 + "\n")
+                lines.append(f"{ssid:<25} {bssid:<18} {signal:<8} {dbm:<8} {snr:<8} {channel:<8} {band:<8} {quality:<12}")
+            
+            # Tests de red si existen
+            if measurement.get('tests'):
+                lines.append(f"\nRESULTADOS DE TESTS DE RED:")
+                lines.append("-" * 40)
                 
-                for ap in ap_summary.get('ap_list', []):
-                    ssid = (ap.get('ssid', 'N/A'))[:24]
-                    bssid = (ap.get('bssid', 'N/A'))[:17]
-                    signal = f"{ap.get('signal_percentage', 0)}%"
-                    dbm = f"{ap.get('signal_dbm', 0):.1f}" if ap.get('signal_dbm') else "N/A"
-                    snr = f"{ap.get('snr_db', 0):.1f}" if ap.get('snr_db') else "N/A"
-                    channel = str(ap.get('channel', 'N/A'))
-                    band = (ap.get('band', 'N/A'))[:7]
-                    quality = (ap.get('signal_quality', 'N/A'))[:11]
-                    
-                    f.write(f"{ssid:<25} {bssid:<18} {signal:<8} {dbm:<8} {snr:<8} {channel:<8} {band:<8} {quality:<12}\n")
+                tests = measurement['tests']
+                if 'ping' in tests and tests['ping'].get('success'):
+                    ping = tests['ping']
+                    lines.append(f"Ping: {ping.get('avg_time', 'N/A'):.1f} ms (promedio)")
+                    lines.append(f"  Min: {ping.get('min_time', 'N/A')} ms, Max: {ping.get('max_time', 'N/A')} ms")
+                    lines.append(f"  Pérdida de paquetes: {ping.get('packet_loss', 'N/A')}")
                 
-                # Tests de red si existen
-                if measurement.get('tests'):
-                    f.write(f"\nRESULTADOS DE TESTS DE RED:\n")
-                    f.write("-" * 40 + "\n")
-                    
-                    tests = measurement['tests']
-                    if 'ping' in tests and tests['ping'].get('success'):
-                        ping = tests['ping']
-                        f.write(f"Ping: {ping.get('avg_time', 'N/A'):.1f} ms (promedio)\n")
-                        f.write(f"  Min: {ping.get('min_time', 'N/A')} ms, Max: {ping.get('max_time', 'N/A')} ms\n")
-                        f.write(f"  Pérdida de paquetes: {ping.get('packet_loss', 'N/A')}\n")
-                    
-                    if 'speedtest' in tests and tests['speedtest'].get('success'):
-                        speed = tests['speedtest']
-                        f.write(f"Speedtest:\n")
-                        f.write(f"  Download: {speed.get('download_mbps', 'N/A'):.1f} Mbps\n")
-                        f.write(f"  Upload: {speed.get('upload_mbps', 'N/A'):.1f} Mbps\n")
-                        f.write(f"  Ping: {speed.get('ping_ms', 'N/A'):.1f} ms\n")
-                        f.write(f"  Servidor: {speed.get('server', 'N/A')}\n")
-                    
-                    if 'iperf_suite' in tests and tests['iperf_suite'].get('success'):
-                        iperf = tests['iperf_suite']
-                        f.write(f"iPerf Suite:\n")
-                        f.write(f"  Servidor: {iperf.get('server', 'N/A')}\n")
+                if 'speedtest' in tests and tests['speedtest'].get('success'):
+                    speed = tests['speedtest']
+                    lines.append(f"Speedtest:")
+                    lines.append(f"  Download: {speed.get('download_mbps', 'N/A'):.1f} Mbps")
+                    lines.append(f"  Upload: {speed.get('upload_mbps', 'N/A'):.1f} Mbps")
+                    lines.append(f"  Ping: {speed.get('ping_ms', 'N/A'):.1f} ms")
+                    lines.append(f"  Servidor: {speed.get('server', 'N/A')}")
                 
-                f.write("\n" + "=" * 80 + "\n")
-                f.write("FIN DEL RESUMEN\n")
-                f.write("=" * 80 + "\n")
+                if 'iperf_suite' in tests and tests['iperf_suite'].get('success'):
+                    iperf = tests['iperf_suite']
+                    lines.append(f"iPerf Suite:")
+                    lines.append(f"  Servidor: {iperf.get('server', 'N/A')}")
+            
+            lines.append("\n" + "=" * 80)
+            lines.append("FIN DEL RESUMEN")
+            lines.append("=" * 80)
+            
+            filepath.write_text('\n'.join(lines) + '\n', encoding='utf-8')
             
             print(f"📄 Resumen legible guardado: {filepath.name}")
             
@@ -332,57 +630,49 @@ class HeatmapManager:
         """Guardar detalles específicos de cada AP en archivos separados."""
         try:
             networks = measurement.get('networks', [])
-            timestamp = measurement.get('timestamp', datetime.now().isoformat())
+            timestamp = measurement.get('timestamp') or datetime.now().isoformat()
             measurement_id = measurement.get('id', 'unknown')
             location = measurement.get('location')
             client_info = measurement.get('client_network_info', {})
             
-            for network in networks:
-                ssid = network.get('ssid', 'unknown')
-                bssid = network.get('bssid', 'unknown')
+            # Ranking por señal calculado una sola vez para todo el escaneo
+            ranked = sorted(networks, key=lambda x: x.get('signal', 0), reverse=True)
+            rank_by_network = {id(n): i for i, n in enumerate(ranked, 1)}
+            strongest = ranked[0].get('signal', 0) if ranked else 0
+            
+            # Un archivo NDJSON por AP: cada escaneo agrega una línea, sin releer lo anterior
+            saved = []
+            with ExitStack() as stack:
+                handles = {}
+                for network in networks:
+                    ssid = network.get('ssid', 'unknown')
+                    bssid = network.get('bssid', 'unknown')
                 
-                # Crear archivo para cada AP
-                ap_filename = f"AP_{ssid}_{bssid.replace(':', '')}_{timestamp.replace(':', '-').replace('.', '_')}.json"
-                ap_filepath = self.ap_details_dir / ap_filename
+                    ap_filename = f"AP_{ssid}_{bssid.replace(':', '')}.ndjson"
+                    f = handles.get(ap_filename)
+                    if f is None:
+                        f = handles[ap_filename] = stack.enter_context(
+                            open(self.ap_details_dir / ap_filename, 'ab', buffering=131072))
                 
-                ap_record = {
-                    'measurement_id': measurement_id,
-                    'timestamp': timestamp,
-                    'location': location,
-                    'client_network_info': client_info,
-                    'ap_details': network,
-                    'measurement_context': {
-                        'total_aps_in_scan': len(networks),
-                        'strongest_signal_in_scan': max([n.get('signal', 0) for n in networks]) if networks else 0,
-                        'ap_rank_by_signal': sorted(networks, key=lambda x: x.get('signal', 0), reverse=True).index(network) + 1 if network in networks else 0
+                    ap_record = {
+                        'measurement_id': measurement_id,
+                        'timestamp': timestamp,
+                        'location': location,
+                        'client_network_info': client_info,
+                        'ap_details': network,
+                        'measurement_context': {
+                            'total_aps_in_scan': len(networks),
+                            'strongest_signal_in_scan': strongest,
+                            'ap_rank_by_signal': rank_by_network[id(network)]
+                        }
                     }
-                }
-                
-                # Si este AP ya tiene archivo, actualizar
-                if ap_filepath.exists():
-                    try:
-                        with open(ap_filepath, 'r', encoding='utf-8') as f:
-                            existing_data = json.load(f)
-                        
-                        # Convertir a lista de mediciones si no lo es ya
-                        if not isinstance(existing_data, list):
-                            existing_data = [existing_data]
-                        
-                        existing_data.append(ap_record)
-                        
-                        with open(ap_filepath, 'w', encoding='utf-8') as f:
-                            json.dump(existing_data, f, indent=2, ensure_ascii=False)
-                            
-                    except Exception:
-                        # Si hay error leyendo archivo existente, sobrescribir
-                        with open(ap_filepath, 'w', encoding='utf-8') as f:
-                            json.dump([ap_record], f, indent=2, ensure_ascii=False)
-                else:
-                    # Archivo nuevo
-                    with open(ap_filepath, 'w', encoding='utf-8') as f:
-                        json.dump([ap_record], f, indent=2, ensure_ascii=False)
+                    f.write(_dumps(ap_record) + b'\n')
+                    saved.append(f"📡 AP guardado: {ssid} ({network.get('signal', 0)}%) -> {ap_filename}")
                 
-                print(f"📡 AP guardado: {ssid} ({network.get('signal', 0)}%) -> {ap_filename}")
+            if Config.VERBOSE_SCANNING:
+                _print_lines(saved)
+            else:
+                print(f"📡 {len(saved)} APs guardados en {self.ap_details_dir.name}/")
                 
         except Exception as e:
             print(f"❌ Error guardando detalles de AP: {e}")
@@ -401,8 +691,22 @@ class HeatmapManager:
         self.define_room("bathroom", 10, 0, 3, 4)
         self.define_room("hallway", 5, 5, 5, 3)
     
-    def collect_measurement_by_id(self, measurement_id: int = None, run_tests: bool = True):
-        """Collect WiFi measurements using ID system for field work."""
+    def _ask_test_plan(self):
+        """Preguntar una sola vez qué tests opcionales correr."""
+        return TestPlan(
+            run_speedtest=input("    Run speedtest? (y/n): ").lower() == 'y',
+            run_iperf=input("    Run iPerf test suite? (y/n): ").lower() == 'y'
+        )
+    
+    def collect_measurement_by_id(self, measurement_id: int = None, run_tests: bool = True,
+                                  plan: TestPlan = None):
+        """Collect WiFi measurements using ID system for field work.
+        
+        Sin plan se pregunta al inicio qué tests correr; con plan no hay preguntas.
+        """
+        if run_tests and plan is None:
+            plan = self._ask_test_plan()
+        
         if measurement_id is None:
             measurement_id = self.next_measurement_id
             self.next_measurement_id += 1
@@ -426,25 +730,16 @@ class HeatmapManager:
         print(f"   Networks found: {len(networks)}")
         
         # Store network data
-        for network in networks:
-            if network['bssid'] != "Unknown":
-                net_data = {
-                    'ssid': network['ssid'],
-                    'bssid': network['bssid'],
-                    'signal': network['signal_percentage'],
-                    'signal_dbm': network.get('signal_dbm'),  
-                    'snr_db': network.get('snr_db'),         
-                    'signal_quality': network.get('signal_quality'),  
-                    'channel': network['channel'],
-                    'band': network.get('band'),             
-                    'authentication': network['authentication']
-                }
-                measurement['networks'].append(net_data)
-                
-                # Mostrar información mejorada
-                signal_dbm_str = f"({network['signal_dbm']:.1f} dBm)" if network.get('signal_dbm') is not None else ""
-                snr_str = f"SNR: {network.get('snr_db', 'N/A'):.1f} dB" if network.get('snr_db') is not None else ""
-                print(f"  📡 {network['ssid']} {network['bssid']} - {network['signal_percentage']}% - Ch{network['channel']} {signal_dbm_str} - {snr_str} - {network.get('signal_quality', 'Unknown')}")
+        measurement['networks'] = _extract_net_data(networks)
+        
+        # Mostrar información mejorada (una sola escritura para toda la lista)
+        if Config.VERBOSE_SCANNING:
+            lines = []
+            for net in measurement['networks']:
+                signal_dbm_str = f"({net['signal_dbm']:.1f} dBm)" if net['signal_dbm'] is not None else ""
+                snr_str = f"SNR: {net['snr_db']:.1f} dB" if net['snr_db'] is not None else ""
+                lines.append(f"  📡 {net['ssid']} {net['bssid']} - {net['signal']}% - Ch{net['channel']} {signal_dbm_str} - {snr_str} - {net['signal_quality'] or 'Unknown'}")
+            _print_lines(lines)
         
         # Run network tests if connected
         if run_tests:
@@ -455,20 +750,21 @@ class HeatmapManager:
                 measurement['client_network_info'] = client_info
                 
                 # Ping test
-                ping_result = self.tester.run_ping()
-                if ping_result['success']:
-                    measurement['tests']['ping'] = ping_result
-                    print(f"    ✓ Ping: {ping_result['avg_time']:.1f}ms")
+                if plan.run_ping:
+                    ping_result = self.tester.run_ping()
+                    if ping_result['success']:
+                        measurement['tests']['ping'] = ping_result
+                        print(f"    ✓ Ping: {ping_result['avg_time']:.1f}ms")
                 
                 # Speedtest (optional - takes time)
-                if input("    Run speedtest? (y/n): ").lower() == 'y':
+                if plan.run_speedtest:
                     speed_result = self.tester.run_speedtest()
                     if speed_result['success']:
                         measurement['tests']['speedtest'] = speed_result
                         print(f"    ✓ Speed: {speed_result['download_mbps']:.1f}↓/{speed_result['upload_mbps']:.1f}↑ Mbps")
                 
                 # iPerf test
-                if input("    Run iPerf test suite? (y/n): ").lower() == 'y':
+                if plan.run_iperf:
                     iperf_result = self.tester.run_iperf_suite()
                     if iperf_result['success']:
                         measurement['tests']['iperf_suite'] = iperf_result
@@ -483,7 +779,7 @@ class HeatmapManager:
         
         # Agregar a datos principales
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"\n✅ Measurement ID {measurement_id} saved successfully!")
         print("   Remember to note this ID on your floor plan!")
@@ -493,29 +789,28 @@ class HeatmapManager:
     
     def map_id_to_coordinates(self, measurement_id: int, x: float, y: float):
         """Map a measurement ID to coordinates after field work."""
+        self._apply_id_mapping(measurement_id, x, y)
+        self._append_mapping('measurement', measurement_id, x, y)
+        print(f"✓ Measurement ID {measurement_id} mapped to coordinates ({x}, {y})")
+    
+    def _apply_id_mapping(self, measurement_id, x, y, rewrite_files=True):
+        """Aplicar en memoria la asignación de coordenadas a una medición."""
         self.id_mapping[measurement_id] = {'x': x, 'y': y}
         
         # Update the measurement with coordinates
-        for measurement in self.measurements:
-            if measurement.get('id') == measurement_id:
-                measurement['location'] = {'x': x, 'y': y}
-                
-                # Also update AP data
-                for network in measurement['networks']:
-                    ap_key = f"{network['ssid']}_{network['bssid']}"
-                    self.ap_data[ap_key].append({
-                        'location': {'x': x, 'y': y},
-                        'signal': network['signal'],
-                        'timestamp': measurement['timestamp']
-                    })
-                
-                # Re-guardar archivo individual con coordenadas actualizadas
+        measurement = self._find_measurement(measurement_id)
+        if measurement is not None:
+            location = measurement['location'] = {'x': x, 'y': y}
+            timestamp = measurement['timestamp']
+            
+            # Also update AP data
+            for network in measurement['networks']:
+                ap_key = self._ap_key(network['ssid'], network['bssid'])
+                self._append_ap_sample(ap_key, location, network['signal'], timestamp)
+            
+            # Re-guardar archivo individual con coordenadas actualizadas
+            if rewrite_files:
                 self.save_individual_measurement(measurement)
-                
-                break
-        
-        self.save_data()
-        print(f"✓ Measurement ID {measurement_id} mapped to coordinates ({x}, {y})")
     
     def batch_map_coordinates(self):
         """Interactive batch mapping of IDs to coordinates."""
@@ -574,49 +869,421 @@ class HeatmapManager:
                 print("   Invalid format, skipping...")
     
     # Métodos de heatmap simplificados (agregar según necesites)
+    def _ap_key(self, ssid, bssid):
+        """Clave 'SSID_BSSID' de ap_data, creada una vez por AP y reutilizada."""
+        key = self._ap_key_cache.get((ssid, bssid))
+        if key is None:
+            key = self._ap_key_cache[(ssid, bssid)] = sys.intern(f"{ssid}_{bssid}")
+            self._ap_names[key] = (ssid, bssid)
+        return key
+    
+    def _ap_name(self, ap_key):
+        """(ssid, bssid) de una clave; las cargadas de disco se parten una sola vez."""
+        names = self._ap_names.get(ap_key)
+        if names is None:
+            # El BSSID no lleva '_': se corta por el último
+            ssid, _, bssid = ap_key.rpartition('_')
+            names = self._ap_names[ap_key] = (ssid, bssid) if ssid else (bssid, 'Unknown')
+        return names
+    
+    def _append_ap_sample(self, ap_key, location, signal, timestamp):
+        """Registrar una muestra de señal de un AP en el almacén columnar."""
+        ap_id = self._ap_key_to_id.get(ap_key)
+        agg = self._ap_agg
+        if ap_id is None:
+            ap_id = self._ap_key_to_id[ap_key] = len(self._ap_id_to_key)
+            self._ap_id_to_key.append(ap_key)
+            agg['count'].append(0)
+            agg['sum'].append(0.0)
+            agg['max'].append(signal)
+            agg['min'].append(signal)
+        
+        agg['count'][ap_id] += 1
+        agg['sum'][ap_id] += signal
+        if signal > agg['max'][ap_id]:
+            agg['max'][ap_id] = signal
+        if signal < agg['min'][ap_id]:
+            agg['min'][ap_id] = signal
+    
+        n = self._ap_len
+        store = self._ap_store
+        _reserve_row(store, n)
+        store['ap_id'][n] = ap_id
+        store['x'][n] = location['x']
+        store['y'][n] = location['y']
+        store['signal'][n] = signal
+        store['ts'][n] = np.datetime64(timestamp, 'us')
+        self._ap_len = n + 1
+    
+    def _ap_columns(self):
+        """Vistas de las columnas del almacén recortadas a las muestras existentes."""
+        return {name: column[:self._ap_len] for name, column in self._ap_store.items()}
+    
+    @property
+    def ap_keys(self):
+        """Claves 'SSID_BSSID' de los APs con muestras, en orden de aparición."""
+        return list(self._ap_id_to_key)
+    
+    @property
+    def ap_data(self):
+        """Vista dict de listas de muestras por AP (se construye desde las columnas)."""
+        columns = self._ap_columns()
+        ap_data = defaultdict(list)
+        for ap_id, x, y, signal, ts in zip(columns['ap_id'].tolist(), columns['x'].tolist(),
+                                           columns['y'].tolist(), columns['signal'].tolist(),
+                                           np.datetime_as_string(columns['ts'], unit='us').tolist()):
+            ap_data[self._ap_id_to_key[ap_id]].append(
+                {'location': {'x': x, 'y': y}, 'signal': signal, 'timestamp': ts}
+            )
+        return ap_data
+    
+    def get_ap_arrays(self, ap_key):
+        """Puntos (N, 2) y señales (N,) de un AP como arrays float32."""
+        columns = self._ap_columns()
+        mask = columns['ap_id'] == self._ap_key_to_id.get(ap_key, -1)
+        points = np.stack([columns['x'][mask], columns['y'][mask]], axis=1)
+        return points, columns['signal'][mask]
+    
+    def _append_perf_sample(self, ap_key, test_result):
+        """Añadir un resultado de test con coordenadas a las columnas de rendimiento."""
+        location = test_result.get('location')
+        if not location:
+            return
+        tests = test_result.get('tests', {})
+        ping = tests.get('ping', {})
+        speed = tests.get('speedtest', {})
+        
+        perf_id = self._perf_key_to_id.get(ap_key)
+        if perf_id is None:
+            perf_id = self._perf_key_to_id[ap_key] = len(self._perf_keys)
+            self._perf_keys.append(ap_key)
+        self._perf_cache.pop(ap_key, None)
+        
+        n = self._perf_len
+        store = self._perf_store
+        _reserve_row(store, n)
+        store['ap_id'][n] = perf_id
+        store['x'][n] = location['x']
+        store['y'][n] = location['y']
+        store['ping_ms'][n] = ping.get('avg_time', np.nan) if ping.get('success') else np.nan
+        store['dl_mbps'][n] = speed.get('download_mbps', np.nan) if speed.get('success') else np.nan
+        self._perf_len = n + 1
+    
+    def _perf_columns(self):
+        """Vistas de las columnas de rendimiento recortadas a las filas existentes."""
+        return {name: column[:self._perf_len] for name, column in self._perf_store.items()}
+    
+    def get_performance_scores(self, ap_key):
+        """Puntos (N, 2) y puntaje 0-100 de rendimiento de un AP, calculado en bloque.
+        
+        30% latencia (100 - ping) y 70% descarga (Mbps, tope 100); un test que
+        no se hizo no suma.
+        """
+        if ap_key not in self._perf_key_to_id:
+            return np.empty((0, 2), dtype=np.float32), np.empty(0, dtype=np.float32)
+        cached = self._perf_cache.get(ap_key)
+        if cached is not None:
+            return cached
+        
+        columns = self._perf_columns()
+        mask = columns['ap_id'] == self._perf_key_to_id[ap_key]
+        scores = _performance_score(columns['ping_ms'][mask], columns['dl_mbps'][mask])
+        
+        result = np.stack([columns['x'][mask], columns['y'][mask]], axis=1), scores
+        self._perf_cache[ap_key] = result
+        return result
+    
+    def get_average_performance(self, ap_key):
+        """Puntaje medio de un AP sobre los tests que dieron algo (0 si no hay)."""
+        _, scores = self.get_performance_scores(ap_key)
+        scored = scores[scores > 0]
+        return float(scored.mean()) if len(scored) else 0.0
+    
+    def _append_measurement(self, measurement):
+        """Añadir una medición nueva a measurements.jsonl sin reescribir el snapshot."""
+        with open(self._measurements_jsonl, 'ab') as f:
+            f.write(_dumps(measurement) + b'\n')
+        
+        print(f"💾 Measurement appended ({len(self.measurements)} measurements)")
+    
+    def _append_mapping(self, kind, measurement_id, x, y):
+        """Registrar una asignación de coordenadas en mappings.jsonl (sin reescribir el snapshot)."""
+        with open(self._mappings_jsonl, 'ab') as f:
+            f.write(_dumps({'kind': kind, 'id': measurement_id, 'x': x, 'y': y}) + b'\n')
+    
+    @property
+    def measurements(self):
+        """Lista de mediciones; se lee de measurements.jsonl la primera vez que se usa."""
+        if self._measurements is None:
+            self.measurements = []
+            self._read_measurements(self._measurements_snapshot_size)
+        return self._measurements
+    
+    @measurements.setter
+    def measurements(self, value):
+        self._measurements = value
+        self._measurement_by_id = {}
+        self._measurements_indexed = 0
+    
+    def _find_measurement(self, measurement_id):
+        """Primera medición con ese id; el índice se completa con las agregadas desde la última búsqueda."""
+        measurements = self.measurements
+        for i in range(self._measurements_indexed, len(measurements)):
+            self._measurement_by_id.setdefault(measurements[i].get('id'), measurements[i])
+        self._measurements_indexed = len(measurements)
+        return self._measurement_by_id.get(measurement_id)
+    
     def save_data(self):
-        """Save all data to disk."""
+        """Save all data to disk (full snapshot; compacts measurements.jsonl)."""
+        measurements = self.measurements
         data = {
             'house_dimensions': {'width': self.house_width, 'length': self.house_length},
             'rooms': self.rooms,
-            'measurements': self.measurements,
-            'ap_data': {k: v for k, v in self.ap_data.items()},
             'network_test_results': {k: v for k, v in self.network_test_results.items()},
             'id_mapping': self.id_mapping,
             'next_measurement_id': self.next_measurement_id,
             'last_updated': datetime.now().isoformat()
         }
         
-        file_path = self.data_dir / "heatmap_data.json"
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Primero las columnas de ap_data: el JSON ya no las lleva
+        self._save_ap_npz()
+        
+        # Mediciones reescritas de a una (con las coordenadas ya asignadas) y cambiadas de golpe
+        tmp_path = self._measurements_jsonl.with_suffix('.jsonl.tmp')
+        with open(tmp_path, 'wb') as f:
+            for measurement in measurements:
+                f.write(_dumps(measurement) + b'\n')
+        os.replace(tmp_path, self._measurements_jsonl)
+        self._measurements_snapshot_size = self._measurements_jsonl.stat().st_size
+        data['measurement_count'] = len(measurements)
+        data['measurements_size'] = self._measurements_snapshot_size
+        
+        # JSON compacto y chico: solo lo que se necesita al arrancar
+        _write_atomic(self.data_dir / "heatmap_data.json", _dumps(data))
         
-        print(f"💾 Data saved ({len(self.measurements)} measurements, {len(self.ap_data)} APs)")
+        # Las asignaciones ya están en el snapshot
+        open(self._mappings_jsonl, 'wb').close()
+        
+        print(f"💾 Data saved ({len(measurements)} measurements, {len(self._ap_id_to_key)} APs)")
     
     def load_data(self):
         """Load data from disk."""
         file_path = self.data_dir / "heatmap_data.json"
+        seen = None
+        measurement_count = 0
+        head_count = 0
         
         if file_path.exists():
             try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
+                with open(file_path, 'rb') as f:
+                    data = _loads(f.read())
                 
                 self.house_width = data['house_dimensions']['width']
                 self.house_length = data['house_dimensions']['length']
                 self.rooms = data['rooms']
-                self.measurements = data['measurements']
-                self.ap_data = defaultdict(list, data['ap_data'])
-                self.network_test_results = defaultdict(list, data.get('network_test_results', {}))
-                self.id_mapping = data.get('id_mapping', {})
+                if self._ap_data_npz.exists():
+                    self._load_ap_npz()
+                else:
+                    # Snapshot antiguo con ap_data dentro del JSON
+                    for ap_key, samples in data.get('ap_data', {}).items():
+                        ap_key = sys.intern(ap_key)
+                        for d in samples:
+                            if d.get('location') is not None:
+                                self._append_ap_sample(ap_key, d['location'], d['signal'], d['timestamp'])
+                # Se toman las listas ya parseadas, sin copiar el dict entero
+                self.network_test_results = defaultdict(list)
+                for ap_key, results in data.pop('network_test_results', {}).items():
+                    ap_key = sys.intern(ap_key)
+                    self.network_test_results[ap_key] = results
+                    for test_result in results:
+                        self._append_perf_sample(ap_key, test_result)
+                self.id_mapping = {int(k): v for k, v in data.get('id_mapping', {}).items()}
                 self.next_measurement_id = data.get('next_measurement_id', 1)
                 
-                print(f"📂 Loaded: {len(self.measurements)} measurements, {len(self.ap_data)} APs")
+                if 'measurements' in data:
+                    # Snapshot antiguo con las mediciones en el JSON: measurements.jsonl es solo la cola
+                    self.measurements = data['measurements']
+                    seen = set()
+                    for measurement in self.measurements:
+                        self._index_measurement(measurement)
+                        seen.add((measurement.get('id'), measurement.get('timestamp')))
+                else:
+                    self._measurements_snapshot_size = data.get('measurements_size', 0)
+                    measurement_count = data.get('measurement_count', 0)
+                    if not self._snapshot_offset_valid(measurement_count):
+                        # El corte no cae tras la última medición del snapshot: se relee todo
+                        print("⚠️ measurements_size no coincide con measurements.jsonl, se relee completo")
+                        self._measurements_snapshot_size = 0
+                        self.measurements = []
+                        seen = set()
+                        head_count = measurement_count
             except Exception as e:
                 print(f"Error loading data: {e}")
+        
+        if seen is not None:
+            self._read_measurements(0, seen, head_count)
+        elif self._pending_log_entries():
+            # Hay mediciones o asignaciones posteriores al snapshot: se cargan ya
+            self._read_measurements(self._measurements_snapshot_size)
+        else:
+            # Nada pendiente: measurements.jsonl se lee recién cuando se usen las mediciones
+            self._measurements = None
+        self._replay_mappings()
+        
+        if self._measurements is not None:
+            measurement_count = len(self._measurements)
+        if measurement_count:
+            print(f"📂 Loaded: {measurement_count} measurements, {len(self._ap_id_to_key)} APs")
+    
+    def _snapshot_offset_valid(self, measurement_count):
+        """True si measurements_size cae justo tras la última de las measurement_count mediciones."""
+        size = self._measurements_snapshot_size
+        if not size:
+            return measurement_count == 0
+        if not self._measurements_jsonl.exists() or self._measurements_jsonl.stat().st_size < size:
+            return False
+        with open(self._measurements_jsonl, 'rb') as f:
+            head = f.read(size)
+        return head.endswith(b'\n') and head.count(b'\n') == measurement_count
+    
+    def _pending_log_entries(self):
+        """True si measurements.jsonl o mappings.jsonl tienen datos que el snapshot no cubre."""
+        if self._measurements_jsonl.exists() and \
+                self._measurements_jsonl.stat().st_size != self._measurements_snapshot_size:
+            return True
+        return self._mappings_jsonl.exists() and self._mappings_jsonl.stat().st_size > 0
+    
+    def _replay_mappings(self):
+        """Volver a aplicar las asignaciones de mappings.jsonl posteriores al snapshot."""
+        if not self._mappings_jsonl.exists():
+            return
+        
+        apply = {'measurement': self._apply_id_mapping,
+                 'network_test': self._apply_network_test_mapping}
+        with open(self._mappings_jsonl, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = _loads(line)
+                except ValueError:
+                    print("⚠️ Línea incompleta en mappings.jsonl, se ignora")
+                    continue
+                
+                # Ya incluida en el snapshot (se cortó antes de vaciar el .jsonl)
+                if self.id_mapping.get(entry['id']) == {'x': entry['x'], 'y': entry['y']}:
+                    continue
+                apply[entry['kind']](entry['id'], entry['x'], entry['y'], rewrite_files=False)
+    
+    def _save_ap_npz(self):
+        """Guardar el almacén columnar de APs en ap_data.npz."""
+        tmp_path = self._ap_data_npz.with_name(self._ap_data_npz.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, keys=np.array(self._ap_id_to_key, dtype=str), **self._ap_columns())
+        os.replace(tmp_path, self._ap_data_npz)
+    
+    def _load_ap_npz(self):
+        """Cargar el almacén columnar de APs desde ap_data.npz."""
+        with np.load(self._ap_data_npz) as npz:
+            keys = npz['keys'].tolist()
+            store = {name: npz[name].astype(dtype, copy=False)
+                     for name, dtype in _AP_COLUMNS if name != 'ap_id'}
+            if 'ap_id' in npz:
+                store['ap_id'] = npz['ap_id'].astype(np.int32, copy=False)
+            else:
+                # Formato anterior: muestras agrupadas por AP con un contador por clave
+                store['ap_id'] = np.repeat(np.arange(len(keys), dtype=np.int32), npz['counts'])
+        
+        self._ap_id_to_key = [sys.intern(key) for key in keys]
+        self._ap_key_to_id = {key: i for i, key in enumerate(self._ap_id_to_key)}
+        self._ap_len = len(store['ap_id'])
+        self._ap_store = store if self._ap_len else _empty_store(_AP_COLUMNS)
+        
+        # Agregados de una vez sobre las columnas; luego se actualizan por muestra
+        n_aps = len(keys)
+        max_signal = np.full(n_aps, -np.inf)
+        min_signal = np.full(n_aps, np.inf)
+        np.maximum.at(max_signal, store['ap_id'], store['signal'])
+        np.minimum.at(min_signal, store['ap_id'], store['signal'])
+        self._ap_agg = {
+            'count': np.bincount(store['ap_id'], minlength=n_aps).tolist(),
+            'sum': np.bincount(store['ap_id'], weights=store['signal'], minlength=n_aps).tolist(),
+            'max': max_signal.tolist(),
+            'min': min_signal.tolist()
+        }
     
-    def collect_measurement_with_tests(self, x: float, y: float, room: str = "", run_tests: bool = True):
-        """Original method - collect WiFi measurements with coordinates."""
+    def _index_measurement(self, measurement):
+        """Actualizar next_measurement_id e id_mapping con una medición cargada."""
+        measurement_id = measurement.get('id')
+        if measurement_id is None:
+            return
+        if measurement_id >= self.next_measurement_id:
+            self.next_measurement_id = measurement_id + 1
+        if measurement.get('location'):
+            self.id_mapping[measurement_id] = measurement['location']
+    
+    def _read_measurements(self, snapshot_size, seen=None, head_count=0):
+        """Leer measurements.jsonl en self._measurements.
+        
+        Los primeros snapshot_size bytes ya están reflejados en ap_data.npz y
+        el JSON; el resto son mediciones posteriores que además alimentan
+        ap_data e id_mapping. seen son las (id, timestamp) ya cargadas (snapshot
+        antiguo con las mediciones en el JSON); las repetidas se descartan.
+        Si el corte en bytes no es fiable se lee desde 0 y las primeras
+        head_count mediciones distintas se toman como las del snapshot.
+        """
+        seen = set() if seen is None else seen
+        if not self._measurements_jsonl.exists():
+            return
+        
+        with open(self._measurements_jsonl, 'rb') as f:
+            for line in f.read(snapshot_size).splitlines():
+                if line.strip():
+                    try:
+                        measurement = _loads(line)
+                    except ValueError:
+                        print("⚠️ Línea incompleta en measurements.jsonl, se ignora")
+                        continue
+                    _intern_networks(measurement.get('networks', ()))
+                    self._measurements.append(measurement)
+            
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    measurement = _loads(line)
+                except ValueError:
+                    print("⚠️ Línea incompleta en measurements.jsonl, se ignora")
+                    continue
+                
+                key = (measurement.get('id'), measurement.get('timestamp'))
+                if key in seen:
+                    continue
+                seen.add(key)
+                _intern_networks(measurement.get('networks', ()))
+                self._measurements.append(measurement)
+                self._index_measurement(measurement)
+                if head_count:
+                    # Ya incluida en ap_data.npz
+                    head_count -= 1
+                    continue
+                
+                # Las mediciones con coordenadas alimentan ap_data al recogerse
+                location = measurement.get('location')
+                if location:
+                    for network in measurement['networks']:
+                        ap_key = self._ap_key(network['ssid'], network['bssid'])
+                        self._append_ap_sample(ap_key, location, network['signal'], measurement['timestamp'])
+    
+    def collect_measurement_with_tests(self, x: float, y: float, room: str = "", run_tests: bool = True,
+                                       plan: TestPlan = None):
+        """Original method - collect WiFi measurements with coordinates.
+        
+        Sin plan se pregunta al inicio qué tests correr; con plan no hay preguntas.
+        """
+        if run_tests and plan is None:
+            plan = self._ask_test_plan()
+        
         networks = self.scanner.scan_networks(force_refresh=True)
         
         measurement = {
@@ -628,25 +1295,17 @@ class HeatmapManager:
         }
         
         # Store network data
-        for network in networks:
-            if network['bssid'] != "Unknown":
-                net_data = {
-                    'ssid': network['ssid'],
-                    'bssid': network['bssid'],
-                    'signal': network['signal_percentage'],
-                    'channel': network['channel'],
-                    'authentication': network['authentication']
-                }
-                measurement['networks'].append(net_data)
+        measurement['networks'] = _extract_net_data(networks, full=False)
                 
-                # Store in AP-specific data
-                ap_key = f"{network['ssid']}_{network['bssid']}"
-                print(f"  📡 {network['ssid']} ({network['bssid']}) - Signal: {network['signal_percentage']}%")
-                self.ap_data[ap_key].append({
-                    'location': {'x': x, 'y': y},
-                    'signal': network['signal_percentage'],
-                    'timestamp': datetime.now().isoformat()
-                })
+        # Store in AP-specific data (el escaneo es un instante: misma hora y ubicación para todas)
+        location, timestamp = measurement['location'], measurement['timestamp']
+        lines = []
+        for net in measurement['networks']:
+            ap_key = self._ap_key(net['ssid'], net['bssid'])
+            lines.append(f"  📡 {net['ssid']} ({net['bssid']}) - Signal: {net['signal']}%")
+            self._append_ap_sample(ap_key, location, net['signal'], timestamp)
+        if Config.VERBOSE_SCANNING:
+            _print_lines(lines)
         
         # Run network tests if connected
         if run_tests:
@@ -655,20 +1314,21 @@ class HeatmapManager:
                 print(f"  Running network tests on {current_conn['ssid']}...")
                 
                 # Ping test
-                ping_result = self.tester.run_ping()
-                if ping_result['success']:
-                    measurement['tests']['ping'] = ping_result
-                    print(f"    Ping: {ping_result['avg_time']:.1f}ms")
+                if plan.run_ping:
+                    ping_result = self.tester.run_ping()
+                    if ping_result['success']:
+                        measurement['tests']['ping'] = ping_result
+                        print(f"    Ping: {ping_result['avg_time']:.1f}ms")
                 
                 # Speedtest (optional - takes time)
-                if input("    Run speedtest? (y/n): ").lower() == 'y':
+                if plan.run_speedtest:
                     speed_result = self.tester.run_speedtest()
                     if speed_result['success']:
                         measurement['tests']['speedtest'] = speed_result
                         print(f"    Speed: {speed_result['download_mbps']:.1f}↓/{speed_result['upload_mbps']:.1f}↑ Mbps")
                 
                 # iPerf test
-                if input("    Run iPerf test suite? (y/n): ").lower() == 'y':
+                if plan.run_iperf:
                     iperf_result = self.tester.run_iperf_suite()
                     if iperf_result['success']:
                         measurement['tests']['iperf_suite'] = iperf_result
@@ -680,13 +1340,16 @@ class HeatmapManager:
         self.save_ap_details(measurement)
         
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"📍 Measurement collected at ({x:.1f}, {y:.1f}) - {len(networks)} networks")
         return measurement
     
-    def test_all_networks_by_id(self, measurement_id: int = None):
-        """Test all available networks at a location using ID system."""
+    def test_all_networks_by_id(self, measurement_id: int = None, *, plan: TestPlan = DEFAULT_PLAN):
+        """Test all available networks at a location using ID system.
+        
+        Los tests de cada red salen de plan, sin preguntar nada durante el recorrido.
+        """
         if measurement_id is None:
             measurement_id = self.next_measurement_id
             self.next_measurement_id += 1
@@ -713,71 +1376,62 @@ class HeatmapManager:
         }
         
         # Store all visible networks info
-        for network in networks:
-            if network['bssid'] != "Unknown":
-                net_data = {
-                    'ssid': network['ssid'],
-                    'bssid': network['bssid'],
-                    'signal': network['signal_percentage'],
-                    'signal_dbm': network.get('signal_dbm'),
-                    'snr_db': network.get('snr_db'),
-                    'signal_quality': network.get('signal_quality'),
-                    'channel': network['channel'],
-                    'band': network.get('band'),
-                    'authentication': network['authentication']
-                }
-                measurement['networks'].append(net_data)
+        measurement['networks'] = _extract_net_data(networks)
         
         # Test each connectable network
-        for network in connectable:
-            ssid = network['ssid']
-            print(f"  📡 {network['ssid']} - Signal: {network['signal_percentage']}% "
-                  f"({network.get('signal_dbm', 'N/A'):.1f} dBm) "
-                  f"SNR: {network.get('snr_db', 'N/A'):.1f} dB "
-                  f"[{network.get('signal_quality', 'Unknown')}]")
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            for network in connectable:
+                ssid = network['ssid']
+                print(f"  📡 {network['ssid']} - Signal: {network['signal_percentage']}% "
+                      f"({network.get('signal_dbm', 'N/A'):.1f} dBm) "
+                      f"SNR: {network.get('snr_db', 'N/A'):.1f} dB "
+                      f"[{network.get('signal_quality', 'Unknown')}]")
             
-            # Connect
-            conn_result = self.scanner.connect_to_network(ssid)
-            if not conn_result['success']:
-                print(f"   ❌ Connection failed: {conn_result['error']}")
-                continue
-            client_info = self.get_current_client_ip_info()
-            measurement['client_network_info'] = client_info
+                # Connect
+                conn_result = self._connect_to_network(ssid)
+                if not conn_result['success']:
+                    print(f"   ❌ Connection failed: {conn_result['error']}")
+                    continue
 
+                # IP del cliente y ping a la vez sobre la misma conexión
+                client_future = pool.submit(self.get_current_client_ip_info)
+                ping_future = pool.submit(self.tester.run_ping) if plan.run_ping else None
             
-            # Run tests
-            network_test = {
-                'ssid': ssid,
-                'bssid': network['bssid'],
-                'signal': network['signal_percentage'],
-                'timestamp': datetime.now().isoformat(),
-                'tests': {}
-            }
+                # Run tests
+                network_test = {
+                    'ssid': ssid,
+                    'bssid': network['bssid'],
+                    'signal': network['signal_percentage'],
+                    'timestamp': datetime.now().isoformat(),
+                    'tests': {}
+                }
             
-            # Ping
-            ping = self.tester.run_ping()
-            if ping['success']:
-                network_test['tests']['ping'] = ping
-                print(f"   ✓ Ping: {ping['avg_time']:.1f}ms")
+                measurement['client_network_info'] = client_future.result()
+                
+                # Ping
+                if ping_future is not None:
+                    ping = ping_future.result()
+                    if ping['success']:
+                        network_test['tests']['ping'] = ping
+                        print(f"   ✓ Ping: {ping['avg_time']:.1f}ms")
             
-            # Speed test for decent signals
-            if network['signal_percentage'] > 40:
-                if input("   Run speedtest? (y/n): ").lower() == 'y':
+                # Speed test for decent signals
+                if plan.run_speedtest and network['signal_percentage'] > plan.min_signal_for_speedtest:
                     speed = self.tester.run_speedtest()
                     if speed['success']:
                         network_test['tests']['speedtest'] = speed
                         print(f"   ✓ Speed: {speed['download_mbps']:.1f}↓/{speed['upload_mbps']:.1f}↑ Mbps")
             
-            # iPerf test
-            if input("    Run iPerf test suite? (y/n): ").lower() == 'y':
-                iperf_result = self.tester.run_iperf_suite()
-                if iperf_result['success']:
-                    network_test['tests']['iperf_suite'] = iperf_result
-                else:
-                    print(f"    ✗ iPerf: {iperf_result['error']}")
+                # iPerf test
+                if plan.run_iperf:
+                    iperf_result = self.tester.run_iperf_suite()
+                    if iperf_result['success']:
+                        network_test['tests']['iperf_suite'] = iperf_result
+                    else:
+                        print(f"    ✗ iPerf: {iperf_result['error']}")
             
-            measurement['all_network_tests'].append(network_test)
-            self.scanner.tested_networks.add(ssid)
+                measurement['all_network_tests'].append(network_test)
+                self.scanner.tested_networks.add(ssid)
         
         # Guardar archivos individuales
         self.save_individual_measurement(measurement)
@@ -785,7 +1439,7 @@ class HeatmapManager:
         
         # Save measurement
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"\n✅ Network testing completed for ID {measurement_id}")
         print(f"   Tested {len(measurement['all_network_tests'])} networks")
@@ -820,27 +1474,16 @@ class HeatmapManager:
         print(f"📊 Redes encontradas: {len(networks)}")
         
         # Store all visible networks info (same structure as test_all_networks_by_id)
-        for network in networks:
-            if network['bssid'] != "Unknown":
-                net_data = {
-                    'ssid': network['ssid'],
-                    'bssid': network['bssid'],
-                    'signal': network['signal_percentage'],
-                    'signal_dbm': network.get('signal_dbm'),
-                    'snr_db': network.get('snr_db'),
-                    'signal_quality': network.get('signal_quality'),
-                    'channel': network['channel'],
-                    'band': network.get('band'),
-                    'authentication': network['authentication']
-                }
-                measurement['networks'].append(net_data)
-                print(f"  📡 {network['ssid']} - {network['signal_percentage']}% - Ch{network['channel']}")
+        measurement['networks'] = _extract_net_data(networks)
+        if Config.VERBOSE_SCANNING:
+            _print_lines([f"  📡 {net['ssid']} - {net['signal']}% - Ch{net['channel']}"
+                          for net in measurement['networks']])
         
         # Guardar igual que test_all_networks_by_id
         self.save_individual_measurement(measurement)
         self.save_ap_details(measurement)
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"✅ Escaneo WiFi completado - ID: {measurement_id}")
         return measurement
@@ -882,19 +1525,8 @@ class HeatmapManager:
         }
         
         # Add current network to networks array if found
-        if current_network and current_network['bssid'] != "Unknown":
-            net_data = {
-                'ssid': current_network['ssid'],
-                'bssid': current_network['bssid'],
-                'signal': current_network['signal_percentage'],
-                'signal_dbm': current_network.get('signal_dbm'),
-                'snr_db': current_network.get('snr_db'),
-                'signal_quality': current_network.get('signal_quality'),
-                'channel': current_network['channel'],
-                'band': current_network.get('band'),
-                'authentication': current_network['authentication']
-            }
-            measurement['networks'].append(net_data)
+        if current_network:
+            measurement['networks'] = _extract_net_data([current_network])
         
         print("\n🚀 Ejecutando SpeedTest...")
         result = self.tester.run_speedtest()
@@ -912,7 +1544,7 @@ class HeatmapManager:
         self.save_individual_measurement(measurement)
         self.save_ap_details(measurement)
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"\n✅ SpeedTest completed for ID {measurement_id}")
         return measurement
@@ -955,19 +1587,8 @@ class HeatmapManager:
         }
         
         # Add current network to networks array if found
-        if current_network and current_network['bssid'] != "Unknown":
-            net_data = {
-                'ssid': current_network['ssid'],
-                'bssid': current_network['bssid'],
-                'signal': current_network['signal_percentage'],
-                'signal_dbm': current_network.get('signal_dbm'),
-                'snr_db': current_network.get('snr_db'),
-                'signal_quality': current_network.get('signal_quality'),
-                'channel': current_network['channel'],
-                'band': current_network.get('band'),
-                'authentication': current_network['authentication']
-            }
-            measurement['networks'].append(net_data)
+        if current_network:
+            measurement['networks'] = _extract_net_data([current_network])
         
         result = self.tester.run_iperf_suite()
         if result['success']:
@@ -980,7 +1601,7 @@ class HeatmapManager:
         self.save_individual_measurement(measurement)
         self.save_ap_details(measurement)
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"\n✅ iPerf completed for ID {measurement_id}")
         return measurement
@@ -1013,21 +1634,10 @@ class HeatmapManager:
         print(f"📊 Redes encontradas: {len(networks)}")
         
         # Store all visible networks info
-        for network in networks:
-            if network['bssid'] != "Unknown":
-                net_data = {
-                    'ssid': network['ssid'],
-                    'bssid': network['bssid'],
-                    'signal': network['signal_percentage'],
-                    'signal_dbm': network.get('signal_dbm'),
-                    'snr_db': network.get('snr_db'),
-                    'signal_quality': network.get('signal_quality'),
-                    'channel': network['channel'],
-                    'band': network.get('band'),
-                    'authentication': network['authentication']
-                }
-                measurement['networks'].append(net_data)
-                print(f"  📡 {network['ssid']} - {network['signal_percentage']}% - Ch{network['channel']}")
+        measurement['networks'] = _extract_net_data(networks)
+        if Config.VERBOSE_SCANNING:
+            _print_lines([f"  📡 {net['ssid']} - {net['signal']}% - Ch{net['channel']}"
+                          for net in measurement['networks']])
         
         # Run SpeedTest if connected
         current = self.scanner.get_current_connection_info()
@@ -1050,7 +1660,7 @@ class HeatmapManager:
         self.save_individual_measurement(measurement)
         self.save_ap_details(measurement)
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"\n✅ WiFi + SpeedTest completed for ID {measurement_id}")
         return measurement
@@ -1083,21 +1693,10 @@ class HeatmapManager:
         print(f"📊 Redes encontradas: {len(networks)}")
         
         # Store all visible networks info
-        for network in networks:
-            if network['bssid'] != "Unknown":
-                net_data = {
-                    'ssid': network['ssid'],
-                    'bssid': network['bssid'],
-                    'signal': network['signal_percentage'],
-                    'signal_dbm': network.get('signal_dbm'),
-                    'snr_db': network.get('snr_db'),
-                    'signal_quality': network.get('signal_quality'),
-                    'channel': network['channel'],
-                    'band': network.get('band'),
-                    'authentication': network['authentication']
-                }
-                measurement['networks'].append(net_data)
-                print(f"  📡 {network['ssid']} - {network['signal_percentage']}% - Ch{network['channel']}")
+        measurement['networks'] = _extract_net_data(networks)
+        if Config.VERBOSE_SCANNING:
+            _print_lines([f"  📡 {net['ssid']} - {net['signal']}% - Ch{net['channel']}"
+                          for net in measurement['networks']])
         
         # Run iPerf if connected
         current = self.scanner.get_current_connection_info()
@@ -1118,7 +1717,7 @@ class HeatmapManager:
         self.save_individual_measurement(measurement)
         self.save_ap_details(measurement)
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"\n✅ WiFi + iPerf completed for ID {measurement_id}")
         return measurement
@@ -1160,19 +1759,8 @@ class HeatmapManager:
         }
         
         # Add current network to networks array if found
-        if current_network and current_network['bssid'] != "Unknown":
-            net_data = {
-                'ssid': current_network['ssid'],
-                'bssid': current_network['bssid'],
-                'signal': current_network['signal_percentage'],
-                'signal_dbm': current_network.get('signal_dbm'),
-                'snr_db': current_network.get('snr_db'),
-                'signal_quality': current_network.get('signal_quality'),
-                'channel': current_network['channel'],
-                'band': current_network.get('band'),
-                'authentication': current_network['authentication']
-            }
-            measurement['networks'].append(net_data)
+        if current_network:
+            measurement['networks'] = _extract_net_data([current_network])
         
         # Run SpeedTest
         print("🚀 Ejecutando SpeedTest...")
@@ -1198,89 +1786,180 @@ class HeatmapManager:
         self.save_individual_measurement(measurement)
         self.save_ap_details(measurement)
         self.measurements.append(measurement)
-        self.save_data()
+        self._append_measurement(measurement)
         
         print(f"\n✅ iPerf + SpeedTest completed for ID {measurement_id}")
         return measurement
 
     def map_network_test_id_to_coordinates(self, measurement_id: int, x: float, y: float):
         """Map a network test ID to coordinates and update all related data."""
+        self._apply_network_test_mapping(measurement_id, x, y)
+        self._append_mapping('network_test', measurement_id, x, y)
+        print(f"✓ Network test ID {measurement_id} mapped to coordinates ({x}, {y})")
+    
+    def _apply_network_test_mapping(self, measurement_id, x, y, rewrite_files=True):
+        """Aplicar en memoria la asignación de coordenadas a un test de redes."""
         self.id_mapping[measurement_id] = {'x': x, 'y': y}
         
         # Find and update the measurement
-        for measurement in self.measurements:
-            if measurement.get('id') == measurement_id:
-                measurement['location'] = {'x': x, 'y': y}
-                
-                # Update AP data for all networks found
-                for network in measurement['networks']:
-                    ap_key = f"{network['ssid']}_{network['bssid']}"
-                    self.ap_data[ap_key].append({
+        measurement = self._find_measurement(measurement_id)
+        if measurement is not None:
+            location = measurement['location'] = {'x': x, 'y': y}
+            timestamp = measurement['timestamp']
+            
+            # Update AP data for all networks found
+            for network in measurement['networks']:
+                ap_key = self._ap_key(network['ssid'], network['bssid'])
+                self._append_ap_sample(ap_key, location, network['signal'], timestamp)
+            
+            # Update network test results if this was a network test
+            if 'all_network_tests' in measurement:
+                for test in measurement['all_network_tests']:
+                    ap_key = self._ap_key(test['ssid'], test['bssid'])
+                    
+                    # Add to AP data for heatmap
+                    self._append_ap_sample(ap_key, location, test['signal'], test['timestamp'])
+                    
+                    # Also add to network test results for performance data
+                    test_result = {
                         'location': {'x': x, 'y': y},
-                        'signal': network['signal'],
-                        'timestamp': measurement['timestamp']
-                    })
-                
-                # Update network test results if this was a network test
-                if 'all_network_tests' in measurement:
-                    for test in measurement['all_network_tests']:
-                        ap_key = f"{test['ssid']}_{test['bssid']}"
-                        
-                        # Add to AP data for heatmap
-                        self.ap_data[ap_key].append({
-                            'location': {'x': x, 'y': y},
-                            'signal': test['signal'],
-                            'timestamp': test['timestamp']
-                        })
-                        
-                        # Also add to network test results for performance data
-                        test_result = {
-                            'location': {'x': x, 'y': y},
-                            'network': {
-                                'ssid': test['ssid'],
-                                'bssid': test['bssid'],
-                                'signal_percentage': test['signal']
-                            },
-                            'timestamp': test['timestamp'],
-                            'tests': test['tests']
-                        }
-                        self.network_test_results[ap_key].append(test_result)
-                
-                # Re-guardar archivo individual con coordenadas
+                        'network': {
+                            'ssid': test['ssid'],
+                            'bssid': test['bssid'],
+                            'signal_percentage': test['signal']
+                        },
+                        'timestamp': test['timestamp'],
+                        'tests': test['tests']
+                    }
+                    self.network_test_results[ap_key].append(test_result)
+                    self._append_perf_sample(ap_key, test_result)
+            
+            # Re-guardar archivo individual con coordenadas
+            if rewrite_files:
                 self.save_individual_measurement(measurement)
-                
-                break
-        
-        self.save_data()
-        print(f"✓ Network test ID {measurement_id} mapped to coordinates ({x}, {y})")
     
     def create_ap_heatmap(self, ap_key: str, include_performance: bool = True):
         """Create heatmap for specific AP with optional performance overlay."""
-        if ap_key not in self.ap_data:
+        if ap_key not in self._ap_key_to_id:
             print(f"No data found for AP: {ap_key}")
             return None
         
-        data = self.ap_data[ap_key]
-        
-        # Filter out data without locations
-        data_with_coords = [d for d in data if d.get('location') is not None]
+        # Solo muestras con coordenadas (ya separadas en columnas)
+        points, values = self.get_ap_arrays(ap_key)
         
-        if len(data_with_coords) < 3:
-            print(f"Insufficient data points with coordinates for {ap_key} ({len(data_with_coords)} points)")
+        if len(points) < 3:
+            print(f"Insufficient data points with coordinates for {ap_key} ({len(points)} points)")
             return None
         
-        print(f"✅ Heatmap would be created for {ap_key} with {len(data_with_coords)} points")
+        if include_performance:
+            perf_points, _ = self.get_performance_scores(ap_key)
+            if len(perf_points):
+                print(f"   ⚡ Rendimiento: {len(perf_points)} puntos, "
+                      f"puntaje medio {self.get_average_performance(ap_key):.1f}")
+        
+        print(f"✅ Heatmap would be created for {ap_key} with {len(points)} points")
         return f"heatmap_{ap_key.replace(':', '-')}.png"
     
     def create_composite_heatmap(self):
         """Create comprehensive composite heatmap."""
-        if not self.ap_data:
+        if not self._ap_len:
             print("No AP data available")
             return None
         
-        print(f"✅ Composite heatmap would be created with {len(self.ap_data)} APs")
+        grids = self.compute_composite_grids()
+        
+        # Densidad de APs: cuántos APs con señal útil se midieron en cada celda
+        density = grids['ap_density']
+        covered = np.count_nonzero(density)
+        print(f"   📶 Celdas con señal útil: {covered}/{density.size} "
+              f"(máx. {int(density.max()) if density.size else 0} APs en una celda)")
+        
+        max_signal = grids['max_signal']
+        print(f"   📈 Señal máxima media en celdas medidas: "
+              f"{max_signal[max_signal > 0].mean() if max_signal.any() else 0:.1f}%")
+        
+        congestion = grids['channel_congestion']
+        if congestion.any():
+            print(f"   📻 Congestión de canales: máx. {congestion.max():.0f} apariciones en una celda")
+        
+        best_ap = grids['best_ap']
+        if (best_ap >= 0).any():
+            labels = [self._ap_name(ap_key)[0] for ap_key in self._perf_keys]
+            wins = np.bincount(best_ap[best_ap >= 0], minlength=len(labels))
+            print(f"   ⚡ Celdas con tests de rendimiento: {int(wins.sum())} "
+                  f"(mejor en más celdas: {labels[int(wins.argmax())]})")
+        
+        print(f"✅ Composite heatmap would be created with {len(self._ap_id_to_key)} APs")
         return "composite_heatmap.png"
     
+    def _grid_shape(self, resolution):
+        """Columnas y filas de la grilla de la casa para una resolución."""
+        nx = max(int(np.ceil(self.house_width / resolution)), 1)
+        ny = max(int(np.ceil(self.house_length / resolution)), 1)
+        return nx, ny
+    
+    def compute_ap_density_grid(self, threshold: float = 20, resolution: float = Config.GRID_RESOLUTION):
+        """Grilla (filas=y, columnas=x) con el número de APs medidos por encima de threshold.
+        
+        Cuenta directamente los puntos medidos, sin interpolar cada AP: todas las
+        muestras se pasan a índices de celda y se reducen con un único bincount.
+        """
+        nx, ny = self._grid_shape(resolution)
+        columns = self._ap_columns()
+        return _compute_ap_density_grid(columns['ap_id'], columns['x'], columns['y'], columns['signal'],
+                                        nx, ny, resolution, threshold)
+        
+    def _channel_usage_columns(self):
+        """Canal y coordenadas (NaN si no hay) de cada red vista en cada medición."""
+        x, y, channel = [], [], []
+        for measurement in self.measurements:
+            location = measurement.get('location') or {'x': np.nan, 'y': np.nan}
+            for network in measurement['networks']:
+                if network.get('channel'):
+                    x.append(location['x'])
+                    y.append(location['y'])
+                    channel.append(network['channel'])
+        return (np.array(x, dtype=np.float32), np.array(y, dtype=np.float32),
+                np.array(channel, dtype=np.int16))
+    
+    def compute_composite_grids(self, threshold: float = 20, resolution: float = Config.GRID_RESOLUTION):
+        """Grillas del compuesto: densidad de APs, señal máxima, mejor rendimiento y congestión.
+        
+        Cada grilla sale de funciones puras sobre columnas, así que con muchas
+        muestras se calculan en procesos separados; el dibujo queda en este.
+        """
+        nx, ny = self._grid_shape(resolution)
+        columns = self._ap_columns()
+        
+        # Puntajes de todos los tests a la vez; el ap_id (índice en _perf_keys) es la etiqueta
+        perf = self._perf_columns()
+        perf_scores = _performance_score(perf['ping_ms'], perf['dl_mbps'])
+        perf_labels = perf['ap_id'].astype(np.int16)
+        usage_x, usage_y, usage_channel = self._channel_usage_columns()
+        
+        jobs = {
+            'ap_density': (_compute_ap_density_grid, columns['ap_id'], columns['x'], columns['y'],
+                           columns['signal'], nx, ny, resolution, threshold),
+            'max_signal': (_compute_max_grid, columns['x'], columns['y'], columns['signal'],
+                           nx, ny, resolution),
+            'best_performance': (_compute_best_grid, perf['x'], perf['y'], perf_scores,
+                                 perf_labels, nx, ny, resolution),
+            'channel_congestion': (_compute_channel_congestion_grid, usage_x, usage_y, usage_channel,
+                                   nx, ny, resolution, Config.AP_INFLUENCE_RADIUS),
+        }
+        
+        # Con pocos datos arrancar procesos cuesta más que calcular aquí
+        if self._ap_len < _PARALLEL_MIN_SAMPLES:
+            grids = {name: func(*args) for name, (func, *args) in jobs.items()}
+        else:
+            with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+                futures = {name: pool.submit(func, *args) for name, (func, *args) in jobs.items()}
+                grids = {name: future.result() for name, future in futures.items()}
+        
+        # best_ap indexa en self._perf_keys; -1 = sin tests en la celda
+        grids['best_performance'], grids['best_ap'] = grids['best_performance']
+        return grids
+    
     def show_current_snr(self):
         """Mostrar SNR de la conexión actual."""
         current = self.scanner.get_current_connection_info()
@@ -1314,10 +1993,12 @@ class HeatmapManager:
         """Get comprehensive statistics."""
         stats = {
             'total_measurements': len(self.measurements),
-            'total_aps': len(self.ap_data),
+            'total_aps': len(self._ap_id_to_key),
             'tested_networks': len(self.network_test_results),
             'individual_files': len(list(self.individual_measurements_dir.glob("*.json"))),
-            'ap_detail_files': len(list(self.ap_details_dir.glob("*.json"))),
+            # Un .ndjson por AP; los .json son detalles guardados antes del formato NDJSON
+            'ap_detail_files': sum(1 for pattern in ("*.ndjson", "*.json")
+                                   for _ in self.ap_details_dir.glob(pattern)),
             'ap_details': [],
             'test_summary': {
                 'total_ping_tests': 0,
@@ -1330,19 +2011,59 @@ class HeatmapManager:
             }
         }
         
-        # AP statistics
-        for ap_key, data in self.ap_data.items():
+        # AP statistics (agregados mantenidos al registrar cada muestra)
+        agg = self._ap_agg
+        for ap_id, ap_key in enumerate(self._ap_id_to_key):
+            count = agg['count'][ap_id]
+            name, bssid = self._ap_name(ap_key)
             ap_stats = {
-                'name': ap_key.split('_')[0],
-                'bssid': ap_key.split('_')[1] if '_' in ap_key else 'Unknown',
-                'measurements': len(data),
-                'avg_signal': np.mean([d['signal'] for d in data]) if data else 0,
-                'max_signal': max([d['signal'] for d in data]) if data else 0,
-                'min_signal': min([d['signal'] for d in data]) if data else 0
+                'name': name,
+                'bssid': bssid,
+                'measurements': count,
+                'avg_signal': agg['sum'][ap_id] / count if count else 0,
+                'max_signal': float(agg['max'][ap_id]) if count else 0,
+                'min_signal': float(agg['min'][ap_id]) if count else 0
             }
             stats['ap_details'].append(ap_stats)
         
         # Sort by average signal
         stats['ap_details'].sort(key=lambda x: x['avg_signal'], reverse=True)
         
-        return stats
\ No newline at end of file
+        # Resumen de tests: arrays de tamaño fijo escritos por índice
+        n_results = sum(len(results) for results in self.network_test_results.values())
+        ping_times = np.empty(n_results, dtype=np.float32)
+        downloads = np.empty(n_results, dtype=np.float32)
+        uploads = np.empty(n_results, dtype=np.float32)
+        throughputs = np.empty(n_results, dtype=np.float32)
+        n_ping = n_speed = n_iperf = 0
+        
+        for results in self.network_test_results.values():
+            for test_result in results:
+                tests = test_result.get('tests', {})
+                ping = tests.get('ping', {})
+                if ping.get('success') and ping.get('avg_time') is not None:
+                    ping_times[n_ping] = ping['avg_time']
+                    n_ping += 1
+                speed = tests.get('speedtest', {})
+                if speed.get('success'):
+                    downloads[n_speed] = speed.get('download_mbps', 0)
+                    uploads[n_speed] = speed.get('upload_mbps', 0)
+                    n_speed += 1
+                tcp_forward = tests.get('iperf_suite', {}).get('tests', {}).get('tcp_forward')
+                if tcp_forward:
+                    throughputs[n_iperf] = tcp_forward['download_mbps']
+                    n_iperf += 1
+        
+        summary = stats['test_summary']
+        summary['total_ping_tests'] = n_ping
+        summary['total_speed_tests'] = n_speed
+        summary['total_iperf_tests'] = n_iperf
+        if n_ping:
+            summary['avg_ping'] = float(ping_times[:n_ping].mean())
+        if n_speed:
+            summary['avg_download'] = float(downloads[:n_speed].mean())
+            summary['avg_upload'] = float(uploads[:n_speed].mean())
+        if n_iperf:
+            summary['avg_throughput'] = float(throughputs[:n_iperf].mean())
+        
+        return stats
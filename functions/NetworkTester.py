@@ -1,11 +1,15 @@
-from traitlets import default
 import subprocess
 import time
 import json
 import re
 import statistics
 import os
-from config.config import Config
+import sys
+from config.config import Config, parse_rate, resolve_iperf_path
+
+# Salida de iperf3 en vivo: se escribe en bytes, sin pasar por print()
+_PREFIX = b"   "
+_CRLF = b"\r\n"
 
 
 class NetworkTester:
@@ -347,10 +351,14 @@ class NetworkTester:
             print("✓ Local iperf3 server already running")
             return True
         
+        iperf = resolve_iperf_path(Config.IPERF_PATH)
+        if iperf is None:
+            return False
+        
         try:
             print("Starting local iperf3 server...")
             subprocess.Popen(
-                [Config.IPERF_PATH, "-s"], 
+                [iperf, "-s"], 
                 creationflags=subprocess.CREATE_NEW_CONSOLE
             )
             time.sleep(2)
@@ -432,7 +440,8 @@ class NetworkTester:
     
     def run_iperf_suite(self, duration=10):
         """Suite completa de tests iPerf con múltiples tests UDP."""
-        if not os.path.exists(Config.IPERF_PATH):
+        iperf = resolve_iperf_path(Config.IPERF_PATH)
+        if iperf is None:
             return {"success": False, "error": "iperf3 not found", "tests": {}, "raw_output": []}
 
         results = {"success": True, "server": self.iperf_server, "tests": {}, "raw_output": []}
@@ -440,42 +449,61 @@ class NetworkTester:
         def stream_process(cmd_list, desc):
             print(f"\n🔄 {desc}")
             print("-" * 50)
-            proc = subprocess.Popen(
+            # Pipe binario: la salida se decodifica una sola vez al final
+            raw = bytearray()
+            with subprocess.Popen(
                 cmd_list,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            lines = []
-            while True:
-                line = proc.stdout.readline()
-                if line == '' and proc.poll() is not None:
-                    break
-                if line:
-                    clean = line.strip()
-                    print(f"   {clean}")
-                    lines.append(line)
-            try:
-                proc.wait(timeout=duration + 10)
-            except subprocess.TimeoutExpired:
-                proc.kill()
-                print(f"   ⚠️ Timeout en {desc}")
-            return lines
+                stderr=subprocess.DEVNULL,
+                bufsize=-1
+            ) as proc:
+                try:
+                    out = getattr(sys.stdout, "buffer", None)
+                    if out is not None:
+                        write = out.write
+                    else:
+                        # stdout de texto sin buffer binario (IDLE, salida capturada)
+                        def write(chunk):
+                            sys.stdout.write(chunk.decode("ascii", "replace"))
+                    sys.stdout.flush()
+                    # Lecturas de hasta 8 KB directas del pipe; las líneas se cortan a mano
+                    fd = proc.stdout.fileno()
+                    buf = bytearray()
+                    while True:
+                        data = os.read(fd, 8192)
+                        if not data:
+                            break
+                        raw.extend(data)
+                        buf.extend(data)
+                        while (nl := buf.find(b"\n")) >= 0:
+                            line = bytes(buf[:nl + 1])
+                            del buf[:nl + 1]
+                            write(_PREFIX + line.rstrip(_CRLF) + b"\n")
+                        sys.stdout.flush()
+                    if buf.strip():
+                        write(_PREFIX + bytes(buf).rstrip(_CRLF) + b"\n")
+                        sys.stdout.flush()
+                    proc.wait(timeout=duration + 10)
+                except subprocess.TimeoutExpired:
+                    print(f"   ⚠️ Timeout en {desc}")
+                finally:
+                    # Cualquier salida anticipada mata el proceso; el with cierra los pipes
+                    if proc.poll() is None:
+                        proc.kill()
+                        proc.wait(timeout=1)
+            return raw.decode("ascii", errors="replace").splitlines(keepends=True)
 
         def run_json(cmd_list):
             try:
                 proc = subprocess.run(
                     cmd_list,
                     capture_output=True,
-                    text=True,
                     timeout=duration + 10
                 )
                 if proc.returncode == 0:
                     return json.loads(proc.stdout)
                 else:
-                    stderr = proc.stderr.strip()
+                    stderr = proc.stderr.decode("ascii", errors="replace").strip()
                     print(f"   ⚠️ Error en JSON command {' '.join(cmd_list)}: returncode {proc.returncode}, stderr: {stderr}")
             except subprocess.TimeoutExpired:
                 print(f"   ⚠️ Timeout en JSON command {' '.join(cmd_list)}")
@@ -504,7 +532,7 @@ class NetworkTester:
 # 1. TCP FORWARD
             print("\n1. TCP FORWARD (cliente -> servidor)")
             tcp_fwd_lines = stream_process([
-                Config.IPERF_PATH, "-c", self.iperf_server, "-t", str(duration), "-i", "1"
+                iperf, "-c", self.iperf_server, "-t", str(duration), "-i", "1"
             ], "TCP FORWARD")
             results["raw_output"].extend(tcp_fwd_lines)
 
@@ -541,7 +569,7 @@ class NetworkTester:
             # 2. TCP REVERSE
             print("\n2. TCP REVERSE (servidor -> cliente)")
             tcp_rev_lines = stream_process([
-                Config.IPERF_PATH, "-c", self.iperf_server, "-R", "-t", str(duration), "-i", "1"
+                iperf, "-c", self.iperf_server, "-R", "-t", str(duration), "-i", "1"
             ], "TCP REVERSE")
             results["raw_output"].extend(tcp_rev_lines)
 
@@ -588,7 +616,7 @@ class NetworkTester:
                 udp_forward_rates.append("10M")
             for rate in udp_forward_rates:
                 udp_fwd_lines = stream_process([
-                    Config.IPERF_PATH, "-c", self.iperf_server, "-u", "-b", rate,
+                    iperf, "-c", self.iperf_server, "-u", "-b", rate,
                     "-t", str(duration), "-i", "1", "-l", "1400"
                 ], f"UDP FORWARD {rate}")
                 results["raw_output"].extend(udp_fwd_lines)
@@ -630,7 +658,7 @@ class NetworkTester:
                                     "PROBLEMÁTICA")
                             
                             results["tests"]["udp_forward_tests"][f"udp_forward_{rate}"] = {
-                                "target_mbps": float(rate.rstrip("M")),
+                                "target_mbps": parse_rate(rate) / 1_000_000,
                                 "actual_mbps": actual_bps / 1_000_000,
                                 "jitter_ms": jitter,
                                 "lost_percent": lost_percent,
@@ -655,7 +683,7 @@ class NetworkTester:
                 udp_reverse_rates.append("10M")
             for rate in udp_reverse_rates:
                 udp_rev_lines = stream_process([
-                    Config.IPERF_PATH, "-c", self.iperf_server, "-u", "-R", "-b", rate,
+                    iperf, "-c", self.iperf_server, "-u", "-R", "-b", rate,
                     "-t", str(duration), "-i", "1", "-l", "1400"
                 ], f"UDP REVERSE {rate}")
                 results["raw_output"].extend(udp_rev_lines)
@@ -693,7 +721,7 @@ class NetworkTester:
                                     "PROBLEMÁTICA")
                             
                             results["tests"]["udp_reverse_tests"][f"udp_reverse_{rate}"] = {
-                                "target_mbps": float(rate.rstrip("M")),
+                                "target_mbps": parse_rate(rate) / 1_000_000,
                                 "actual_mbps": actual_bps / 1_000_000,
                                 "jitter_ms": jitter,
                                 "lost_percent": lost_percent,
@@ -769,4 +797,4 @@ class NetworkTester:
         except subprocess.TimeoutExpired:
             return {"success": False, "error": "Traceroute timeout"}
         except Exception as e:
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e)}
@@ -18,6 +18,8 @@ class WiFiScanner:
         self.tested_networks = set()
         # NUEVO: Cache de APs por SSID+BSSID
         self.ap_cache = {}  # Key: "SSID_BSSID", Value: AP data
+        # BSSIDs a seguir (en minúsculas, como los muestra netsh); vacío = todos
+        self.tracked_bssids = frozenset(b.lower() for b in getattr(Config, 'MONITORED_BSSIDS', ()))
     
     def scan_networks(self, force_refresh=False) -> List[Dict]:
         """
@@ -317,6 +319,11 @@ class WiFiScanner:
             if self._should_monitor_ssid(network["ssid"]):
                 print(f"   ⚠️ Red {network['ssid']} sin BSSID - múltiples APs no se distinguirán")
         
+        # Con MONITORED_BSSIDS solo se guardan esos APs: los vecinos se descartan antes de copiarse
+        if self.tracked_bssids and not getattr(Config, 'MONITOR_ALL_NETWORKS', False):
+            if network.get("bssid", "").lower() not in self.tracked_bssids:
+                return False
+        
         return self._should_monitor_ssid(network["ssid"])
     
     def _percentage_to_dbm(self, percentage: int) -> float:
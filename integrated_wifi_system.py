@@ -6,8 +6,6 @@ Includes: WiFi scanning, network testing (ping, speedtest, iperf), and heatmap g
 
 import json
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
@@ -17,13 +15,10 @@ import time
 import os
 from collections import defaultdict
 import statistics
-from scipy.interpolate import Rbf
-from scipy.interpolate import griddata
-import numpy as np
 from functions.NetworkTester import NetworkTester
 from functions.WifiScanner import WiFiScanner
 from config.config import Config
-from functions.HeatmapManager import HeatmapManager
+from functions.HeatmapManager import HeatmapManager, TestPlan
 from functions.EthernetTester import EthernetTester
 
 
@@ -88,6 +83,8 @@ def main():
         choice = input("Select option: ").strip()
         
         if choice == "0":
+            # Snapshot completo al salir (las mediciones ya están en measurements.jsonl)
+            manager.save_data()
             print("Goodbye!")
             break
             
@@ -110,14 +107,18 @@ def main():
             manager.batch_map_coordinates()
                 
         elif choice == "4":
-            # Test all networks by ID
-                manager.test_all_networks_by_id()
+            # Test all networks by ID (los tests se eligen una vez para todas las redes)
+                plan = TestPlan(
+                    run_speedtest=input("Run speedtest on each network? (y/n): ").lower() == 'y',
+                    run_iperf=input("Run iPerf test suite on each network? (y/n): ").lower() == 'y'
+                )
+                manager.test_all_networks_by_id(plan=plan)
                 
         elif choice == "5":
             auto_collect(manager)
             
         elif choice == "6":
-            for ap_key in manager.ap_data.keys():
+            for ap_key in manager.ap_keys:
                 try:
                     manager.create_ap_heatmap(ap_key)
                 except Exception as e:
@@ -204,8 +205,11 @@ def ethernet_diagnostics():
     # Ejecutar test
     server = input("Servidor iPerf (Enter para iperf.he.net): ").strip() or "iperf.he.net"
     duration = int(input("Duración en segundos (Enter para 10): ").strip() or "10")
+    print("   ⚠️ En paralelo TCP y UDP comparten el enlace: sus números no son comparables con el modo secuencial")
+    udp_port = input("Puerto UDP para test en paralelo (Enter para secuencial): ").strip()
     
-    EthernetTester.test_ethernet_speed(selected['name'], server, duration)
+    EthernetTester.test_ethernet_speed(selected['name'], server, duration,
+                                       udp_port=int(udp_port) if udp_port else None)
 
 def auto_collect(manager):
     """Automated measurement collection."""
@@ -213,6 +217,11 @@ def auto_collect(manager):
         num = int(input("Number of measurements: "))
         interval = float(input("Interval (seconds): ") or 30)
         run_tests = input("Run network tests? (y/n): ").lower() == 'y'
+        # Los tests opcionales se eligen una vez: el recorrido no se detiene a preguntar
+        plan = TestPlan(
+            run_speedtest=input("Run speedtest at each position? (y/n): ").lower() == 'y',
+            run_iperf=input("Run iPerf test suite at each position? (y/n): ").lower() == 'y'
+        ) if run_tests else None
         
         print(f"\nCollecting {num} measurements...")
         for i in range(num):
@@ -220,7 +229,7 @@ def auto_collect(manager):
             y = np.random.uniform(0, manager.house_length)
             
             print(f"\n[{i+1}/{num}] Position: ({x:.1f}, {y:.1f})")
-            manager.collect_measurement_with_tests(x, y, run_tests=run_tests)
+            manager.collect_measurement_with_tests(x, y, run_tests=run_tests, plan=plan)
             
             if i < num - 1:
                 time.sleep(interval)
@@ -417,4 +426,4 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\nError: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
@@ -6,6 +6,7 @@ from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import seaborn as sns
 from pathlib import Path
 
@@ -15,6 +16,7 @@ class HeatmapAnalyzer:
     def __init__(self, data_dir: str = "data"):
         self.data_dir = Path(".")
         self.data_dir.mkdir(exist_ok=True)
+        self._figures = {}  # (filas, columnas) -> (fig, axes) reutilizados entre llamadas
         
     def load_historical_data(self, days: int = 7) -> List[Dict]:
         """Carga datos históricos de los últimos N días."""
@@ -235,9 +237,31 @@ class HeatmapAnalyzer:
         
         return round(consistency, 1)
     
+    def _get_fig(self, layout: Tuple[int, int], figsize: Tuple[float, float]):
+        """Devuelve la figura de ese layout, creándola solo la primera vez y limpia en las siguientes.
+        
+        Se crea con Figure (no plt.subplots) para que no quede registrada en pyplot:
+        un plt.show() posterior no la vuelve a abrir.
+        """
+        if layout not in self._figures:
+            fig = Figure(figsize=figsize)
+            axes = fig.subplots(*layout)
+            specs = {ax: ax.get_subplotspec() for ax in np.atleast_1d(axes).ravel()}
+            self._figures[layout] = (fig, axes, specs)
+            return fig, axes
+        
+        fig, axes, specs = self._figures[layout]
+        for ax in fig.axes:
+            if ax in specs:
+                ax.clear()
+                ax.set_subplotspec(specs[ax])  # la barra de color le había quitado espacio
+            else:
+                fig.delaxes(ax)  # barras de color añadidas por seaborn
+        return fig, axes
+    
     def create_visual_heatmap(self, heatmap_data: Dict, output_file: str = "wifi_heatmap.png"):
         """Crea visualización de mapa de calor."""
-        fig, axes = plt.subplots(2, 2, figsize=(15, 12))
+        fig, axes = self._get_fig((2, 2), figsize=(15, 12))
         fig.suptitle('WiFi Network Heatmap Analysis', fontsize=16, fontweight='bold')
         
         # Preparar datos para visualización
@@ -287,8 +311,7 @@ class HeatmapAnalyzer:
                    ax=axes[1,1])
         axes[1,1].set_title('Latencia Promedio (ms)')
         
-        plt.tight_layout()
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(output_file, dpi=300, bbox_inches='tight')
         
         return output_file
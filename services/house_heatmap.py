@@ -3,15 +3,109 @@ import statistics
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.colors import Normalize
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
 from pathlib import Path
 import subprocess
 import re
-from scipy.interpolate import griddata
 import threading
 import time
+from config.config import Config
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba es opcional: sin él se usa la versión NumPy
+    njit = None
+
+try:
+    import numexpr as ne
+except ImportError:  # numexpr es opcional: fusiona el cálculo de pesos con power=2
+    ne = None
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _idw_kernel(x_mesh, y_mesh, points_x, points_y, values, power, eps, out):
+        """Kernel IDW compilado: un bucle fusionado por celda, filas en paralelo."""
+        half = power / 2.0
+        for i in prange(x_mesh.shape[0]):
+            for j in range(x_mesh.shape[1]):
+                wsum = 0.0
+                vsum = 0.0
+                for k in range(values.shape[0]):
+                    dx = x_mesh[i, j] - points_x[k]
+                    dy = y_mesh[i, j] - points_y[k]
+                    if half == 1.0:
+                        w = 1.0 / (dx * dx + dy * dy + eps)
+                    else:
+                        w = (dx * dx + dy * dy + eps) ** -half
+                    wsum += w
+                    vsum += w * values[k]
+                out[i, j] = min(max(vsum / wsum, 0.0), 100.0)
+        return out
+else:
+    _idw_kernel = None
+
+
+def _idw_interpolate(x_mesh, y_mesh, points_x, points_y, values, power=2, eps=1e-9, out=None,
+                     radius=None):
+    """Interpolación por distancia inversa (IDW) evaluada sobre toda la malla.
+    
+    Sin triangulación: con las pocas decenas de puntos que tiene una
+    habitación es mucho más barato que griddata cúbico y nunca deja NaNs.
+    Si se pasa out, el resultado se escribe ahí en lugar de en un array nuevo.
+    Trabaja en el dtype de la malla (float32 en LiveHeatmapGrid).
+    Con numba instalado se usa el kernel compilado.
+    Con radius solo se evalúa la ventana que cubre los puntos más ese radio;
+    el resto de la malla queda a 0 (como el fill_value=0 de griddata).
+    """
+    if radius is not None:
+        xs, ys = x_mesh[0], y_mesh[:, 0]
+        ix0 = np.searchsorted(xs, points_x.min() - radius, side='left')
+        ix1 = np.searchsorted(xs, points_x.max() + radius, side='right')
+        iy0 = np.searchsorted(ys, points_y.min() - radius, side='left')
+        iy1 = np.searchsorted(ys, points_y.max() + radius, side='right')
+        
+        if ix0 > 0 or iy0 > 0 or ix1 < xs.size or iy1 < ys.size:
+            if out is None:
+                out = np.empty_like(x_mesh)
+            out.fill(0)
+            window = np.s_[iy0:iy1, ix0:ix1]
+            _idw_interpolate(x_mesh[window], y_mesh[window], points_x, points_y, values,
+                             power, eps, out[window])
+            return out
+    
+    if _idw_kernel is not None:
+        if out is None:
+            out = np.empty_like(x_mesh)
+        return _idw_kernel(x_mesh, y_mesh, points_x, points_y, values, float(power), eps, out)
+    
+    if power == 2 and ne is not None:
+        # p=2: w = 1/d², todo en una sola pasada de numexpr y en el dtype de la malla
+        dtype = x_mesh.dtype.type
+        xm, ym = x_mesh[..., None], y_mesh[..., None]
+        px, py = points_x.astype(dtype, copy=False), points_y.astype(dtype, copy=False)
+        one, eps = dtype(1), dtype(eps)
+        weights = ne.evaluate('one / ((xm - px) ** 2 + (ym - py) ** 2 + eps)')
+    else:
+        # Pesos calculados en el mismo buffer (H, W, N) para no crear temporales
+        weights = x_mesh[..., None] - points_x
+        weights *= weights
+        dy = y_mesh[..., None] - points_y
+        dy *= dy
+        weights += dy
+        weights += eps
+        if power == 2:
+            np.reciprocal(weights, out=weights)  # evita la rama genérica de np.power
+        else:
+            np.power(weights, -power / 2, out=weights)
+    
+    out = np.einsum('ijk,k->ij', weights, values, out=out)
+    out /= weights.sum(axis=-1)
+    return np.clip(out, 0, 100, out=out)
+
 
 class SimpleHouseLocationService:
     """Servicio de ubicación simple para interiores de casa."""
@@ -87,6 +181,10 @@ class LiveHeatmapGrid:
         self.fig = None
         self.axes = {}
         
+        # Escala fija 0-100% compartida por todos los heatmaps y puntos
+        self._sig_norm = Normalize(vmin=0, vmax=100)
+        self._room_patches = {}  # Contorno de cada habitación, creado una sola vez
+        
     def initialize_room_grids(self):
         """Inicializa las grillas para cada habitación."""
         for room_name, room_info in self.analyzer.location_service.rooms.items():
@@ -94,21 +192,35 @@ class LiveHeatmapGrid:
             x_points = int(room_info['width'] / self.grid_resolution) + 1
             y_points = int(room_info['length'] / self.grid_resolution) + 1
             
-            # Coordenadas de la grilla
+            # Coordenadas de la grilla (float32: la salida es un mapa de 8 bits por canal)
             x_grid = np.linspace(room_info['x_start'], 
                                room_info['x_start'] + room_info['width'], 
-                               x_points)
+                               x_points, dtype=np.float32)
             y_grid = np.linspace(room_info['y_start'], 
                                room_info['y_start'] + room_info['length'], 
-                               y_points)
+                               y_points, dtype=np.float32)
+            
+            x_mesh, y_mesh = np.meshgrid(x_grid, y_grid)
+            
+            # Malla densa (0.2m) para la interpolación: se crea una sola vez
+            x_dense = np.linspace(room_info['x_start'], 
+                                 room_info['x_start'] + room_info['width'], 
+                                 int(room_info['width'] / 0.2) + 1, dtype=np.float32)
+            y_dense = np.linspace(room_info['y_start'], 
+                                 room_info['y_start'] + room_info['length'], 
+                                 int(room_info['length'] / 0.2) + 1, dtype=np.float32)
+            x_dense_mesh, y_dense_mesh = np.meshgrid(x_dense, y_dense)
             
             self.room_grids[room_name] = {
                 'x_grid': x_grid,
                 'y_grid': y_grid,
-                'x_mesh': np.meshgrid(x_grid, y_grid)[0],
-                'y_mesh': np.meshgrid(x_grid, y_grid)[1],
-                'signal_grid': np.zeros((y_points, x_points)),
-                'measurement_count': np.zeros((y_points, x_points)),
+                'x_mesh': x_mesh,
+                'y_mesh': y_mesh,
+                'x_dense_mesh': x_dense_mesh,
+                'y_dense_mesh': y_dense_mesh,
+                'interp_grid': np.empty_like(x_dense_mesh),
+                'signal_grid': np.zeros((y_points, x_points), dtype=np.float32),
+                'measurement_count': np.zeros((y_points, x_points), dtype=np.uint16),
                 'last_update': None
             }
             
@@ -186,7 +298,7 @@ class LiveHeatmapGrid:
             current_signal = grid_data['signal_grid'][y_idx, x_idx]
             
             # Promedio incremental
-            new_count = current_count + 1
+            new_count = int(current_count) + 1
             new_signal = (current_signal * current_count + signal_strength) / new_count
             
             grid_data['signal_grid'][y_idx, x_idx] = new_signal
@@ -203,43 +315,35 @@ class LiveHeatmapGrid:
         grid_data = self.room_grids[room_name]
         room_info = self.analyzer.location_service.rooms[room_name]
         
-        # Obtener puntos con mediciones
-        measured_points = []
-        measured_signals = []
+        # Puntos con mediciones como arrays separados (x, y, señal)
+        rows, cols = np.nonzero(grid_data['measurement_count'])
+        if rows.size < 3:
+            return None  # Necesitamos al menos 3 puntos para interpolación
         
-        for i in range(grid_data['signal_grid'].shape[0]):
-            for j in range(grid_data['signal_grid'].shape[1]):
-                if grid_data['measurement_count'][i, j] > 0:
-                    # Convertir índices a coordenadas globales
-                    x_global = room_info['x_start'] + j * self.grid_resolution
-                    y_global = room_info['y_start'] + i * self.grid_resolution
-                    
-                    measured_points.append((x_global, y_global))
-                    measured_signals.append(grid_data['signal_grid'][i, j])
+        points_x = (room_info['x_start'] + cols * self.grid_resolution).astype(np.float32)
+        points_y = (room_info['y_start'] + rows * self.grid_resolution).astype(np.float32)
+        signals = grid_data['signal_grid'][rows, cols]
         
-        if len(measured_points) < 3:
-            return None  # Necesitamos al menos 3 puntos para interpolación
+        # Grilla densa precalculada en initialize_room_grids
+        x_mesh = grid_data['x_dense_mesh']
+        y_mesh = grid_data['y_dense_mesh']
         
-        # Crear grilla densa para interpolación
-        x_dense = np.linspace(room_info['x_start'], 
-                             room_info['x_start'] + room_info['width'], 
-                             int(room_info['width'] / 0.2) + 1)
-        y_dense = np.linspace(room_info['y_start'], 
-                             room_info['y_start'] + room_info['length'], 
-                             int(room_info['length'] / 0.2) + 1)
-        
-        x_mesh, y_mesh = np.meshgrid(x_dense, y_dense)
-        
-        # Interpolación
-        try:
-            z_interpolated = griddata(measured_points, measured_signals, 
-                                    (x_mesh, y_mesh), method='cubic', fill_value=0)
-            return x_mesh, y_mesh, z_interpolated
-        except:
-            # Fallback a interpolación lineal
-            z_interpolated = griddata(measured_points, measured_signals, 
-                                    (x_mesh, y_mesh), method='linear', fill_value=0)
-            return x_mesh, y_mesh, z_interpolated
+        # Interpolación IDW (sin triangulación ni fallback) sobre el buffer de la habitación
+        z_interpolated = _idw_interpolate(x_mesh, y_mesh, points_x, points_y, signals,
+                                          out=grid_data['interp_grid'],
+                                          radius=Config.AP_INFLUENCE_RADIUS)
+        return x_mesh, y_mesh, z_interpolated
+    
+    def _get_room_patch(self, room_name: str, room_info: Dict):
+        """Rectángulo de la habitación; ax.clear() lo suelta y se vuelve a añadir tal cual."""
+        rect = self._room_patches.get(room_name)
+        if rect is None:
+            rect = self._room_patches[room_name] = patches.Rectangle(
+                (room_info['x_start'], room_info['y_start']),
+                room_info['width'], room_info['length'],
+                linewidth=3, edgecolor='navy', facecolor='lightgray', alpha=0.1
+            )
+        return rect
     
     def update_display(self):
         """Actualiza la visualización de todos los heatmaps con mejoras visuales."""
@@ -265,55 +369,49 @@ class LiveHeatmapGrid:
             ax.set_xlabel('X (metros)', fontsize=9)
             ax.set_ylabel('Y (metros)', fontsize=9)
             ax.grid(True, alpha=0.3, linestyle='--')
-            ax.set_aspect('equal')
+            ax.set_aspect('equal', adjustable='box')
             
-            # Dibujar contorno de la habitación con estilo
-            rect = patches.Rectangle(
-                (room_info['x_start'], room_info['y_start']),
-                room_info['width'], room_info['length'],
-                linewidth=3, edgecolor='navy', facecolor='lightgray', alpha=0.1
-            )
-            ax.add_patch(rect)
+            # Dibujar contorno de la habitación (el mismo artista en cada actualización)
+            ax.add_patch(self._get_room_patch(room_name, room_info))
+            
+            # Celdas medidas: coordenadas, señal y conteo en arrays para dibujarlas de una vez
+            rows, cols = np.nonzero(grid_data['measurement_count'])
+            x_pos = room_info['x_start'] + cols * self.grid_resolution
+            y_pos = room_info['y_start'] + rows * self.grid_resolution
+            measured_signals = grid_data['signal_grid'][rows, cols]
+            counts = grid_data['measurement_count'][rows, cols].astype(np.int32)
             
             # Interpolar y mostrar heatmap
             interpolation_result = self.interpolate_room_heatmap(room_name)
             if interpolation_result:
                 x_mesh, y_mesh, z_interpolated = interpolation_result
                 
-                # Crear heatmap con más niveles para suavidad
-                contour = ax.contourf(x_mesh, y_mesh, z_interpolated, 
-                                    levels=30, alpha=0.8, cmap='RdYlGn', 
-                                    vmin=0, vmax=100)
+                # Heatmap como malla rasterizada (una sola pasada, sin polígonos de contorno)
+                contour = ax.pcolormesh(x_mesh, y_mesh, z_interpolated, 
+                                        shading='auto', alpha=0.8, cmap='RdYlGn', 
+                                        norm=self._sig_norm, rasterized=True)
                 
                 # Agregar líneas de contorno para mejor definición
+                # 'serial' de ContourPy es más rápido que el 'mpl2014' por defecto
                 contour_lines = ax.contour(x_mesh, y_mesh, z_interpolated, 
                                          levels=[25, 50, 75], colors='black', 
-                                         alpha=0.4, linewidths=0.8)
+                                         alpha=0.4, linewidths=0.8, algorithm='serial')
                 ax.clabel(contour_lines, inline=True, fontsize=8, fmt='%d%%')
                 
-                # Agregar puntos de medición con tamaño variable
-                for i in range(grid_data['signal_grid'].shape[0]):
-                    for j in range(grid_data['signal_grid'].shape[1]):
-                        if grid_data['measurement_count'][i, j] > 0:
-                            x_pos = room_info['x_start'] + j * self.grid_resolution
-                            y_pos = room_info['y_start'] + i * self.grid_resolution
-                            signal = grid_data['signal_grid'][i, j]
-                            count = grid_data['measurement_count'][i, j]
+                # Puntos de medición en un solo scatter; más mediciones = puntos más grandes
+                ax.scatter(x_pos, y_pos, c=measured_signals, s=80 + counts * 20, 
+                           cmap='RdYlGn', edgecolors='black', 
+                           linewidths=1.5, norm=self._sig_norm, zorder=5)
                             
-                            # Tamaño del punto basado en número de mediciones
-                            point_size = 80 + (count * 20)  # Más mediciones = puntos más grandes
-                            
-                            scatter = ax.scatter(x_pos, y_pos, c=signal, s=point_size, 
-                                               cmap='RdYlGn', edgecolors='black', 
-                                               linewidths=1.5, vmin=0, vmax=100, zorder=5)
-                            
-                            # Etiqueta de señal con mejor formato
-                            label_color = 'white' if signal < 50 else 'black'
-                            ax.annotate(f'{signal:.0f}%\n({int(count)})', (x_pos, y_pos), 
-                                      ha='center', va='center', fontsize=7, 
-                                      fontweight='bold', color=label_color,
-                                      bbox=dict(boxstyle='round,pad=0.3', 
-                                              facecolor='white', alpha=0.9, edgecolor='gray'))
+                # Etiqueta de señal con mejor formato
+                for x, y, signal, count in zip(x_pos.tolist(), y_pos.tolist(), 
+                                               measured_signals.tolist(), counts.tolist()):
+                    label_color = 'white' if signal < 50 else 'black'
+                    ax.annotate(f'{signal:.0f}%\n({count})', (x, y), 
+                              ha='center', va='center', fontsize=7, 
+                              fontweight='bold', color=label_color,
+                              bbox=dict(boxstyle='round,pad=0.3', 
+                                      facecolor='white', alpha=0.9, edgecolor='gray'))
                 
                 # Agregar barra de color solo en el primer subplot
                 if room_name == list(self.axes.keys())[0]:
@@ -322,21 +420,15 @@ class LiveHeatmapGrid:
             
             else:
                 # Si no hay suficientes datos para interpolación, mostrar solo puntos
-                for i in range(grid_data['signal_grid'].shape[0]):
-                    for j in range(grid_data['signal_grid'].shape[1]):
-                        if grid_data['measurement_count'][i, j] > 0:
-                            x_pos = room_info['x_start'] + j * self.grid_resolution
-                            y_pos = room_info['y_start'] + i * self.grid_resolution
-                            signal = grid_data['signal_grid'][i, j]
+                ax.scatter(x_pos, y_pos, c=measured_signals, s=150, cmap='RdYlGn',
+                         edgecolors='black', linewidths=2, norm=self._sig_norm)
                             
-                            ax.scatter(x_pos, y_pos, c=signal, s=150, cmap='RdYlGn',
-                                     edgecolors='black', linewidths=2, vmin=0, vmax=100)
-                            
-                            ax.annotate(f'{signal:.0f}%', (x_pos, y_pos), 
-                                      xytext=(0, 20), textcoords='offset points',
-                                      ha='center', fontsize=9, fontweight='bold',
-                                      bbox=dict(boxstyle='round,pad=0.3', 
-                                              facecolor='yellow', alpha=0.8))
+                for x, y, signal in zip(x_pos.tolist(), y_pos.tolist(), measured_signals.tolist()):
+                    ax.annotate(f'{signal:.0f}%', (x, y), 
+                              xytext=(0, 20), textcoords='offset points',
+                              ha='center', fontsize=9, fontweight='bold',
+                              bbox=dict(boxstyle='round,pad=0.3', 
+                                      facecolor='yellow', alpha=0.8))
                 
                 # Mensaje de información
                 ax.text(0.5, 0.5, 'Necesita más mediciones\npara interpolación', 
@@ -353,13 +445,7 @@ class LiveHeatmapGrid:
                 time_str = "N/A"
             
             # Calcular calidad de señal promedio
-            measured_signals = []
-            for i in range(grid_data['signal_grid'].shape[0]):
-                for j in range(grid_data['signal_grid'].shape[1]):
-                    if grid_data['measurement_count'][i, j] > 0:
-                        measured_signals.append(grid_data['signal_grid'][i, j])
-            
-            avg_quality = statistics.mean(measured_signals) if measured_signals else 0
+            avg_quality = float(measured_signals.mean()) if measured_signals.size else 0
             quality_color = 'green' if avg_quality > 70 else 'orange' if avg_quality > 40 else 'red'
             
             info_text = f"📊 Mediciones: {total_measurements}\n⚡ Promedio: {avg_quality:.1f}%\n🕒 Última: {time_str}"
@@ -791,4 +877,4 @@ def setup_and_run_enhanced_heatmap():
             print("❌ Opción no válida")
 
 if __name__ == "__main__":
-    setup_and_run_enhanced_heatmap()
\ No newline at end of file
+    setup_and_run_enhanced_heatmap()